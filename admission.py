@@ -0,0 +1,184 @@
+# flake8: noqa
+import itertools
+import os
+import threading
+import time
+from collections import deque
+
+# Lower value wins; live chat turns are admitted ahead of background work
+LANES = {"interactive": 0, "background": 1}
+
+
+class AdmissionTimeout(TimeoutError):
+    """Raised when a request waits longer than its admission timeout"""
+
+
+class TokenBucket:
+    """Classic token bucket; `level` may go negative when usage is settled after the fact"""
+
+    def __init__(self, capacity: float, refill_per_sec: float):
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.level = capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.refill_per_sec)
+        self._updated = now
+
+    def can_take(self, amount: float) -> bool:
+        # Oversized requests are admitted once the bucket is full so they can't starve
+        return self.level >= min(amount, self.capacity)
+
+    def seconds_until(self, amount: float) -> float:
+        missing = min(amount, self.capacity) - self.level
+        return 0.0 if missing <= 0 else missing / self.refill_per_sec
+
+    def take(self, amount: float):
+        self.level -= amount
+
+
+class _Limits:
+    """Request and token buckets for one scope (global or a single tenant)"""
+
+    def __init__(self, rpm: float, tpm: float, period: float):
+        self.requests = TokenBucket(rpm, rpm / period)
+        self.tokens = TokenBucket(tpm, tpm / period)
+
+    def refill(self, now: float):
+        self.requests.refill(now)
+        self.tokens.refill(now)
+
+    def can_take(self, tokens: int) -> bool:
+        return self.requests.can_take(1) and self.tokens.can_take(tokens)
+
+    def seconds_until(self, tokens: int) -> float:
+        return max(self.requests.seconds_until(1), self.tokens.seconds_until(tokens))
+
+    def take(self, tokens: int):
+        self.requests.take(1)
+        self.tokens.take(tokens)
+
+    def idle(self) -> bool:
+        return self.requests.level >= self.requests.capacity and self.tokens.level >= self.tokens.capacity
+
+
+class AdmissionController:
+    """
+    Admission control in front of every LLM client: a global and a per-tenant
+    pair of token buckets (requests and tokens per `period`), with priority
+    lanes so waiting interactive calls are always admitted before background
+    ones. Queue time is tracked per lane.
+    """
+
+    def __init__(self, global_rpm: float = None, global_tpm: float = None,
+                 tenant_rpm: float = None, tenant_tpm: float = None,
+                 period: float = 60.0, timeout: float = None):
+        self.period = period
+        self.tenant_rpm = tenant_rpm or float(os.getenv("LLM_TENANT_RPM", "20"))
+        self.tenant_tpm = tenant_tpm or float(os.getenv("LLM_TENANT_TPM", "40000"))
+        self.timeout = timeout or float(os.getenv("LLM_ADMISSION_TIMEOUT_S", "30"))
+        self.global_limits = _Limits(
+            global_rpm or float(os.getenv("LLM_GLOBAL_RPM", "500")),
+            global_tpm or float(os.getenv("LLM_GLOBAL_TPM", "200000")),
+            period,
+        )
+        self._tenants = {}
+        self._waiters = []  # (lane priority, seq, tenant, tokens)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._queue_times = {lane: deque(maxlen=1000) for lane in LANES}
+        self._admitted = {lane: 0 for lane in LANES}
+        self._rejected = {lane: 0 for lane in LANES}
+
+    def _tenant(self, tenant: str) -> _Limits:
+        limits = self._tenants.get(tenant)
+        if limits is None:
+            if len(self._tenants) > 10000:
+                waiting = {w[2] for w in self._waiters}
+                for name in [n for n, l in self._tenants.items() if n not in waiting and l.idle()]:
+                    del self._tenants[name]
+            limits = self._tenants[tenant] = _Limits(self.tenant_rpm, self.tenant_tpm, self.period)
+        return limits
+
+    def _next_grantable(self):
+        """Highest-priority waiter whose tenant has capacity, or None"""
+        for waiter in sorted(self._waiters):
+            if self._tenant(waiter[2]).can_take(waiter[3]):
+                return waiter
+        return None
+
+    def acquire(self, tenant: str, tokens: int, lane: str = "interactive", timeout: float = None) -> float:
+        """Block until the request is admitted; returns seconds spent queued"""
+        timeout = self.timeout if timeout is None else timeout
+        waiter = (LANES[lane], next(self._seq), tenant, tokens)
+        start = time.monotonic()
+        with self._cond:
+            self._waiters.append(waiter)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self.global_limits.refill(now)
+                    self._tenant(tenant).refill(now)
+                    for other in self._waiters:
+                        self._tenant(other[2]).refill(now)
+
+                    if self._next_grantable() is waiter and self.global_limits.can_take(tokens):
+                        self.global_limits.take(tokens)
+                        self._tenant(tenant).take(tokens)
+                        waited = now - start
+                        self._queue_times[lane].append(waited)
+                        self._admitted[lane] += 1
+                        return waited
+
+                    remaining = start + timeout - now
+                    if remaining <= 0:
+                        self._rejected[lane] += 1
+                        raise AdmissionTimeout(f"LLM request for tenant {tenant!r} not admitted within {timeout:.0f}s")
+                    retry_in = max(self.global_limits.seconds_until(tokens),
+                                   self._tenant(tenant).seconds_until(tokens), 0.005)
+                    self._cond.wait(min(retry_in, remaining))
+            finally:
+                self._waiters.remove(waiter)
+                self._cond.notify_all()
+
+    def try_acquire(self, tenant: str, tokens: int, lane: str = "interactive") -> bool:
+        """Admit immediately if there is capacity and nobody admissible is waiting; never queues"""
+        with self._cond:
+            now = time.monotonic()
+            self.global_limits.refill(now)
+            limits = self._tenant(tenant)
+            limits.refill(now)
+            for other in self._waiters:
+                self._tenant(other[2]).refill(now)
+            if self._next_grantable() is not None or not (self.global_limits.can_take(tokens) and limits.can_take(tokens)):
+                return False
+            self.global_limits.take(tokens)
+            limits.take(tokens)
+            self._queue_times[lane].append(0.0)
+            self._admitted[lane] += 1
+            return True
+
+    def settle(self, tenant: str, estimated: int, actual: int):
+        """Correct token buckets once the real usage of an admitted call is known"""
+        delta = actual - estimated
+        if not delta:
+            return
+        with self._cond:
+            self.global_limits.tokens.take(delta)
+            self._tenant(tenant).tokens.take(delta)
+
+    def metrics(self) -> dict:
+        with self._cond:
+            result = {}
+            for lane, samples in self._queue_times.items():
+                ordered = sorted(samples)
+                result[lane] = {
+                    "admitted": self._admitted[lane],
+                    "rejected": self._rejected[lane],
+                    "waiting": sum(1 for w in self._waiters if w[0] == LANES[lane]),
+                    "queue_ms_p50": round(ordered[len(ordered) // 2] * 1000, 1) if ordered else 0.0,
+                    "queue_ms_p95": round(ordered[int(len(ordered) * 0.95)] * 1000, 1) if ordered else 0.0,
+                    "queue_ms_max": round(ordered[-1] * 1000, 1) if ordered else 0.0,
+                }
+            return result
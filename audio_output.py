@@ -0,0 +1,263 @@
+# flake8: noqa
+"""
+Low-latency output stage for streamed 16-bit mono PCM. Network chunks are
+copied straight into a preallocated ring buffer through memoryviews, and
+the device callback copies out of it into the device's own buffer. Playback
+starts (and, after an underrun, resumes) only once the jitter buffer holds
+`jitter_ms` of audio or the stream has ended.
+"""
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+SAMPLE_RATE = 24000
+SAMPLE_BYTES = 2  # int16 mono
+
+
+class PCMRingBuffer:
+    """Fixed-capacity byte ring; one producer, one consumer"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._read = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def free(self) -> int:
+        return self.capacity - self._size
+
+    def clear(self):
+        with self._lock:
+            self._read = 0
+            self._size = 0
+
+    def write(self, data) -> int:
+        """Copy as much of `data` as fits; returns the number of bytes taken"""
+        src = memoryview(data).cast("B")
+        with self._lock:
+            n = min(len(src), self.capacity - self._size)
+            start = (self._read + self._size) % self.capacity
+            first = min(n, self.capacity - start)
+            self._view[start:start + first] = src[:first]
+            self._view[:n - first] = src[first:n]
+            self._size += n
+        return n
+
+    def read_into(self, out: memoryview, align: int = SAMPLE_BYTES) -> int:
+        """Copy up to len(out) bytes (whole samples only) into `out`"""
+        with self._lock:
+            n = min(len(out), self._size)
+            n -= n % align
+            first = min(n, self.capacity - self._read)
+            out[:first] = self._view[self._read:self._read + first]
+            out[first:n] = self._view[:n - first]
+            self._read = (self._read + n) % self.capacity
+            self._size -= n
+        return n
+
+
+@dataclass
+class PlaybackStats:
+    bytes_played: int = 0
+    time_to_first_sample_ms: float = None
+    underruns: int = 0
+    underrun_ms: float = 0.0
+    duration_ms: float = 0.0
+
+
+class SoundDeviceSink:
+    """Speaker output through sounddevice's raw int16 stream"""
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, blocksize: int = 480, device=None):
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        self.device = device
+        self._stream = None
+
+    def start(self, callback):
+        import sounddevice as sd
+
+        def on_audio(outdata, frames, time_info, status):
+            callback(memoryview(outdata).cast("B"))
+
+        self._stream = sd.RawOutputStream(samplerate=self.sample_rate, channels=1, dtype="int16",
+                                          blocksize=self.blocksize, device=self.device, callback=on_audio)
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+class NullAudioDevice:
+    """
+    Device stand-in that pulls blocks at the real-time rate (or as fast as
+    possible with realtime=False) and discards them; for tests and benchmarks.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, blocksize: int = 480, realtime: bool = True):
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        self.realtime = realtime
+        self.blocks = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, callback):
+        block = memoryview(bytearray(self.blocksize * SAMPLE_BYTES))
+        period = self.blocksize / self.sample_rate
+        self._stop.clear()
+
+        def run():
+            next_at = time.perf_counter()
+            while not self._stop.is_set():
+                callback(block)
+                self.blocks += 1
+                if self.realtime:
+                    next_at += period
+                    time.sleep(max(0.0, next_at - time.perf_counter()))
+
+        self._thread = threading.Thread(target=run, name="null-audio", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def default_device():
+    """AUDIO_DEVICE=null selects the null device; anything else plays on the speakers"""
+    if os.getenv("AUDIO_DEVICE", "") == "null":
+        return NullAudioDevice()
+    return SoundDeviceSink()
+
+
+class AudioOutput:
+    """
+    Plays a stream of PCM chunks through a jitter buffer. One utterance plays
+    at a time; the ring is allocated once and reused. Counts underruns
+    (the device asked for audio the network had not delivered yet) and time to
+    first sample, per utterance and in total.
+    """
+
+    def __init__(self, device=None, sample_rate: int = SAMPLE_RATE, jitter_ms: float = None,
+                 capacity_s: float = None, chunk_bytes: int = 4800):
+        self.device = device or default_device()
+        self.sample_rate = sample_rate
+        self.jitter_ms = float(os.getenv("AUDIO_JITTER_MS", "200")) if jitter_ms is None else jitter_ms
+        capacity_s = capacity_s or float(os.getenv("AUDIO_RING_S", "10"))
+        self.ring = PCMRingBuffer(int(capacity_s * sample_rate) * SAMPLE_BYTES)
+        self.chunk_bytes = chunk_bytes
+        self._zeros = memoryview(bytes(chunk_bytes))
+        self._play_lock = threading.Lock()
+        self.utterances = 0
+        self.underruns = 0
+        self.underrun_ms = 0.0
+        self.last = PlaybackStats()
+
+    def _ms_to_bytes(self, ms: float) -> int:
+        return int(ms * self.sample_rate / 1000) * SAMPLE_BYTES
+
+    def _silence(self, out: memoryview):
+        if len(out) > len(self._zeros):
+            self._zeros = memoryview(bytes(len(out)))
+        out[:] = self._zeros[:len(out)]
+
+    async def play(self, audio):
+        """Play a complete buffer (bytes, mmap or ndarray) without copying it first"""
+        view = memoryview(audio).cast("B")
+
+        async def chunks():
+            for offset in range(0, len(view), self.chunk_bytes):
+                yield view[offset:offset + self.chunk_bytes]
+
+        return await self.play_stream(chunks())
+
+    async def play_stream(self, chunks) -> PlaybackStats:
+        """Play PCM from an async iterator of bytes-like chunks; returns this utterance's stats"""
+        if not self._play_lock.acquire(blocking=False):
+            raise RuntimeError("Audio output is already playing an utterance")
+        try:
+            return await self._play_stream(chunks)
+        finally:
+            self._play_lock.release()
+
+    async def _play_stream(self, chunks) -> PlaybackStats:
+        loop = asyncio.get_running_loop()
+        done = asyncio.Event()
+        space = asyncio.Event()
+        stats = PlaybackStats()
+        jitter_bytes = min(max(self._ms_to_bytes(self.jitter_ms), SAMPLE_BYTES), self.ring.capacity // 2)
+        state = {"buffering": True, "eof": False, "starved_at": None, "finished": False}
+        started = time.perf_counter()
+        self.ring.clear()
+
+        def callback(out: memoryview):
+            if state["finished"]:
+                self._silence(out)
+                return
+            if state["buffering"] and (len(self.ring) >= jitter_bytes or state["eof"]):
+                state["buffering"] = False
+                if state["starved_at"] is not None:
+                    stats.underrun_ms += (time.perf_counter() - state["starved_at"]) * 1000
+                    state["starved_at"] = None
+            n = 0 if state["buffering"] else self.ring.read_into(out)
+            if n:
+                if stats.time_to_first_sample_ms is None:
+                    stats.time_to_first_sample_ms = (time.perf_counter() - started) * 1000
+                stats.bytes_played += n
+                loop.call_soon_threadsafe(space.set)
+            self._silence(out[n:])
+            if n < len(out) and not state["buffering"]:
+                if state["eof"] and len(self.ring) < SAMPLE_BYTES:
+                    state["finished"] = True
+                    loop.call_soon_threadsafe(done.set)
+                else:
+                    # Starved mid-utterance: rebuffer up to the jitter depth before resuming
+                    stats.underruns += 1
+                    state["buffering"] = True
+                    state["starved_at"] = time.perf_counter()
+
+        self.device.start(callback)
+        try:
+            async for chunk in chunks:
+                view = memoryview(chunk).cast("B")
+                while view:
+                    taken = self.ring.write(view)
+                    view = view[taken:]
+                    if view:
+                        space.clear()
+                        await space.wait()
+            state["eof"] = True
+            await done.wait()
+        finally:
+            state["eof"] = True
+            state["finished"] = True
+            self.device.stop()
+
+        stats.duration_ms = (time.perf_counter() - started) * 1000
+        self.utterances += 1
+        self.underruns += stats.underruns
+        self.underrun_ms += stats.underrun_ms
+        self.last = stats
+        return stats
+
+    def metrics(self) -> dict:
+        return {
+            "utterances": self.utterances,
+            "underruns": self.underruns,
+            "underrun_ms": round(self.underrun_ms, 1),
+            "jitter_ms": self.jitter_ms,
+            "last_time_to_first_sample_ms": round(self.last.time_to_first_sample_ms or 0.0, 1),
+        }
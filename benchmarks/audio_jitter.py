@@ -0,0 +1,67 @@
+# flake8: noqa
+"""
+Plays a simulated TTS stream (PCM chunks arriving with network jitter and
+occasional stalls) through AudioOutput on the null device, for several
+jitter-buffer depths, and reports underruns and time to first sample.
+
+    python -m benchmarks.audio_jitter --depths 0,100,200,400 --utterances 5
+"""
+import argparse
+import asyncio
+import random
+
+import numpy as np
+
+from audio_output import AudioOutput, NullAudioDevice, SAMPLE_RATE
+from benchmarks.fakes import percentile
+
+
+async def jittery_stream(pcm: bytes, rng: random.Random, chunk_bytes: int, rate_x: float,
+                         jitter_s: float, stall_rate: float, stall_s: float):
+    """Yield chunks at `rate_x` times real time, with random jitter and stalls"""
+    view = memoryview(pcm)
+    chunk_s = chunk_bytes / 2 / SAMPLE_RATE / rate_x
+    for offset in range(0, len(view), chunk_bytes):
+        delay = chunk_s + rng.uniform(0, jitter_s)
+        if rng.random() < stall_rate:
+            delay += stall_s
+        await asyncio.sleep(delay)
+        yield view[offset:offset + chunk_bytes]
+
+
+async def run(depth_ms: float, args) -> dict:
+    rng = random.Random(args.seed)
+    output = AudioOutput(NullAudioDevice(), jitter_ms=depth_ms)
+    seconds = args.seconds
+    pcm = (np.sin(np.arange(int(seconds * SAMPLE_RATE)) / 8) * 3000).astype(np.int16).tobytes()
+    first = []
+    for _ in range(args.utterances):
+        stats = await output.play_stream(jittery_stream(pcm, rng, args.chunk_bytes, args.rate_x,
+                                                        args.jitter_s, args.stall_rate, args.stall_s))
+        first.append(stats.time_to_first_sample_ms / 1000)
+    return {"depth": depth_ms, "underruns": output.underruns, "underrun_ms": output.underrun_ms,
+            "ttfs_p50": percentile(first, 50), "ttfs_max": max(first)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--depths", default="0,100,200,400", help="comma-separated jitter-buffer depths (ms)")
+    parser.add_argument("--utterances", type=int, default=5)
+    parser.add_argument("--seconds", type=float, default=3.0, help="audio length per utterance")
+    parser.add_argument("--chunk-bytes", type=int, default=4800, help="network chunk size (4800 = 100ms)")
+    parser.add_argument("--rate-x", type=float, default=1.5, help="stream delivery speed vs real time")
+    parser.add_argument("--jitter-s", type=float, default=0.08)
+    parser.add_argument("--stall-rate", type=float, default=0.05)
+    parser.add_argument("--stall-s", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'depth ms':>8} {'underruns':>10} {'gap ms':>8} {'ttfs p50':>9} {'ttfs max':>9}")
+    for depth in [float(d) for d in args.depths.split(",")]:
+        r = asyncio.run(run(depth, args))
+        print(f"{r['depth']:>8.0f} {r['underruns']:>10} {r['underrun_ms']:>8.0f} "
+              f"{r['ttfs_p50'] * 1000:>7.0f}ms {r['ttfs_max'] * 1000:>7.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# flake8: noqa
+"""
+Measures storage bytes written per turn for three state schemas: the
+legacy one (transcript duplicated in a resent `conversation_history` list),
+a single `add_messages` list (whole list re-serialized at every step), and
+session_state.State, whose checkpoints reference the transcript store (bytes
+in the store are counted too). The chatbot node is a fake, so only the state
+layout differs between the runs.
+
+    python -m benchmarks.checkpoint_size --turns 40
+"""
+import argparse
+import uuid
+from typing import Annotated
+from typing_extensions import TypedDict
+
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import StateGraph, START, END
+from langgraph.graph.message import add_messages
+
+from session_state import State
+
+
+class ListState(TypedDict):
+    messages: Annotated[list, add_messages]
+    user_email: str | None
+    session_ended: bool
+
+
+class LegacyState(TypedDict):
+    messages: Annotated[list, add_messages]
+    conversation_history: list
+    user_email: str | None
+    session_ended: bool
+
+
+REPLY = "That sounds really heavy… Would it be okay if I ask how you've been sleeping lately? " * 3
+USER_TURN = "I've been feeling stretched thin between work and family, and I can't switch off at night. " * 2
+
+
+def fake_chatbot(state):
+    return {"messages": [AIMessage(content=REPLY)]}
+
+
+def build(schema):
+    graph = StateGraph(schema)
+    graph.add_node("chatbot", fake_chatbot)
+    graph.add_edge(START, "chatbot")
+    graph.add_edge("chatbot", END)
+    saver = MemorySaver()
+    return graph.compile(checkpointer=saver), saver
+
+
+def _payload_bytes(value) -> int:
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_payload_bytes(v) for v in value.values())
+    if isinstance(value, (tuple, list)):
+        return sum(_payload_bytes(v) for v in value)
+    return 0
+
+
+def stored_bytes(app, saver: MemorySaver) -> int:
+    """Serialized bytes held by the saver (checkpoints, channel blobs, pending writes) and the transcript store"""
+    saved = sum(_payload_bytes(getattr(saver, attr, {})) for attr in ("storage", "blobs", "writes"))
+    store = getattr(app.channels["messages"], "store", None)
+    return saved + sum(len(node[3]) + 64 for node in store._nodes.values()) if store else saved
+
+
+def run(schema, turns: int, legacy: bool) -> list:
+    app, saver = build(schema)
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    history = []
+    sizes = [stored_bytes(app, saver)]
+    for _ in range(turns):
+        if legacy:
+            history.append(f"User: {USER_TURN}")
+            state = {
+                "messages": [{"role": "user", "content": USER_TURN}],
+                "conversation_history": history,
+                "user_email": None,
+                "session_ended": False,
+            }
+        else:
+            state = {"messages": [{"role": "user", "content": USER_TURN}]}
+        app.invoke(state, config=config)
+        if legacy:
+            history.append(f"Therapist: {REPLY}")
+        sizes.append(stored_bytes(app, saver))
+    return [b - a for a, b in zip(sizes, sizes[1:])]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=40)
+    args = parser.parse_args()
+
+    runs = {"legacy": run(LegacyState, args.turns, legacy=True),
+            "single list": run(ListState, args.turns, legacy=False),
+            "transcript store": run(State, args.turns, legacy=False)}
+
+    print(f"{'turn':>5}" + "".join(f" {label + ' B/turn':>23}" for label in runs))
+    for turn in sorted({1, args.turns // 4, args.turns // 2, args.turns}):
+        print(f"{turn:>5}" + "".join(f" {sizes[turn - 1]:>23,}" for sizes in runs.values()))
+    legacy = sum(runs["legacy"])
+    print("total  " + "  ".join(f"{label}={sum(sizes):,} B ({1 - sum(sizes) / legacy:.0%} smaller)"
+                                for label, sizes in runs.items() if label != "legacy"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# flake8: noqa
+import random
+import threading
+import time
+
+
+class FakeResponse:
+    def __init__(self, content: str, tokens: int = 0):
+        self.content = content
+        self.tool_calls = []
+        self.usage_metadata = {"total_tokens": tokens}
+
+
+class LatencyInjectingModel:
+    """
+    Stand-in chat model whose latency follows a heavy-tailed mix: most calls
+    take `base` seconds (with jitter), `tail_rate` of them stall for `tail`.
+    """
+
+    def __init__(self, base: float = 0.05, jitter: float = 0.02, tail: float = 1.0,
+                 tail_rate: float = 0.05, error_rate: float = 0.0, seed: int = None):
+        self.base = base
+        self.jitter = jitter
+        self.tail = tail
+        self.tail_rate = tail_rate
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self.calls = 0
+
+    def sample_latency(self) -> float:
+        if self._rng.random() < self.tail_rate:
+            return self.tail
+        return max(0.0, self._rng.gauss(self.base, self.jitter))
+
+    def bind_tools(self, tools):
+        return self
+
+    def invoke(self, messages, **kwargs):
+        self.calls += 1
+        time.sleep(self.sample_latency())
+        if self._rng.random() < self.error_rate:
+            raise ConnectionError("injected upstream failure")
+        return FakeResponse("I hear you. Tell me a little more about that.", tokens=120)
+
+
+def percentile(samples, p: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class RateLimitError(Exception):
+    """429 raised by RateLimitedModel"""
+
+
+class RateLimitedModel:
+    """
+    Fake provider endpoint enforcing a sliding-window request limit, like
+    OpenAI's RPM limit, scaled to `window` seconds. Over-limit calls fail
+    with RateLimitError instead of being served.
+    """
+
+    def __init__(self, limit: int, window: float = 1.0, latency: float = 0.02):
+        self.limit = limit
+        self.window = window
+        self.latency = latency
+        self.served = 0
+        self.rejected = 0
+        self._calls = []
+        self._lock = threading.Lock()
+
+    def bind_tools(self, tools):
+        return self
+
+    def invoke(self, messages, **kwargs):
+        with self._lock:
+            now = time.monotonic()
+            self._calls = [t for t in self._calls if now - t < self.window]
+            if len(self._calls) >= self.limit:
+                self.rejected += 1
+                raise RateLimitError("429 Too Many Requests")
+            self._calls.append(now)
+            self.served += 1
+        time.sleep(self.latency)
+        return FakeResponse("Thank you for sharing that with me.", tokens=150)
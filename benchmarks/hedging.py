@@ -0,0 +1,53 @@
+# flake8: noqa
+"""
+Compares tail latency of plain LLM calls against ResilientCaller hedging,
+using a fake model with injected heavy-tail latency.
+
+    python -m benchmarks.hedging --calls 400
+"""
+import argparse
+import time
+
+from llm_resilience import ResilientCaller
+from benchmarks.fakes import LatencyInjectingModel, percentile
+
+
+def run(calls: int, invoke) -> list:
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        invoke()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(label: str, latencies: list):
+    print(f"{label:<10} p50={percentile(latencies, 50)*1000:7.1f}ms  "
+          f"p95={percentile(latencies, 95)*1000:7.1f}ms  "
+          f"p99={percentile(latencies, 99)*1000:7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--tail-rate", type=float, default=0.05)
+    parser.add_argument("--tail", type=float, default=0.5)
+    args = parser.parse_args()
+
+    messages = [{"role": "user", "content": "I've been feeling overwhelmed lately."}]
+
+    plain_model = LatencyInjectingModel(tail=args.tail, tail_rate=args.tail_rate, seed=1)
+    plain = run(args.calls, lambda: plain_model.invoke(messages))
+
+    hedged_model = LatencyInjectingModel(tail=args.tail, tail_rate=args.tail_rate, seed=1)
+    caller = ResilientCaller(deadline=10)
+    hedged = run(args.calls, lambda: caller.invoke(hedged_model, messages))
+
+    report("plain", plain)
+    report("hedged", hedged)
+    print(f"hedges sent={caller.hedges_sent} won={caller.hedges_won} "
+          f"extra calls={hedged_model.calls - args.calls} ({(hedged_model.calls - args.calls) / args.calls:.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+# flake8: noqa
+"""
+Load generator for the therapy graph. Runs N concurrent sessions against
+logic.create_graph with an in-memory checkpointer, swapping the LLM, web
+search and SMTP backends for fakes with log-normal latencies, and ramps N up
+step by step. For each step it reports p50/p95/p99 turn latency, throughput,
+RSS growth and peak thread count.
+
+    python -m benchmarks.loadtest --ramp 10,50,100,200 --turns 6 --time-scale 0.1
+
+--workers N runs the graph in a GraphWorkerPool of N processes instead of in
+this interpreter (RSS and thread counts are then the supervisor's only).
+--cpu-ms adds GIL-holding work to every fake LLM call, standing in for
+message conversion, markdown rendering and JSON serialization.
+
+--time-scale compresses every simulated latency and think time (and the
+admission-control period with them) so a ramp finishes in minutes.
+"""
+import os
+
+# logic.py reads credentials at import time; the fakes never use them
+os.environ.setdefault("OPENAI_API_KEY", "sk-loadtest")
+os.environ.setdefault("TAVILY_API_KEY", "tvly-loadtest")
+os.environ.setdefault("EMAIL", "loadtest@example.com")
+os.environ.setdefault("APP_PASSWORD", "loadtest")
+os.environ.setdefault("ROUTING_LOG_PATH", "")
+
+import argparse
+import json
+import math
+import random
+import resource
+import threading
+import time
+import uuid
+
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+import logic
+from admission import AdmissionController
+from benchmarks.fakes import percentile
+from worker_pool import GraphWorkerPool
+
+USER_LINES = [
+    "Honestly it's been a rough week, work has been piling up.",
+    "I keep waking up at 3am and can't fall back asleep.",
+    "My sister and I had an argument and it's still on my mind.",
+    "I guess I'm okay, just a bit flat lately.",
+    "Are there any breathing techniques that actually help with panic?",
+]
+FINAL_LINE = "Thanks, I feel a bit better. Goodbye — my email is loadtest.user@example.com"
+REPLY = "That sounds really heavy… Would it be okay if I ask a little more about how that's been for you?"
+
+
+class LogNormal:
+    """Latency sampler parameterised by median and spread, in seconds"""
+
+    def __init__(self, median: float, sigma: float, scale: float):
+        self.mu = math.log(median)
+        self.sigma = sigma
+        self.scale = scale
+
+    def sample(self) -> float:
+        return random.lognormvariate(self.mu, self.sigma) * self.scale
+
+
+class FakeChatModel:
+    """Chat model stand-in that sleeps like the real API and occasionally calls tools"""
+
+    def __init__(self, latency: LogNormal, search_rate: float, cpu_s: float = 0.0, with_tools: bool = False):
+        self.latency = latency
+        self.search_rate = search_rate
+        self.cpu_s = cpu_s
+        self.with_tools = with_tools
+
+    def bind_tools(self, tools):
+        return FakeChatModel(self.latency, self.search_rate, self.cpu_s, with_tools=True)
+
+    def _tool_calls(self, messages) -> list:
+        last = messages[-1]
+        if not isinstance(last, dict) or last.get("role") != "user":
+            return []
+        if "Goodbye" in last["content"]:
+            return [
+                {"name": "analyze_therapy_session", "args": {}},
+                {"name": "send_analysis_email", "args": {"email": "loadtest.user@example.com",
+                                                         "analysis": "# Your Personal Therapy Session Report"}},
+            ]
+        if random.random() < self.search_rate:
+            return [{"name": "search_web", "args": {"query": "grounding techniques for anxiety"}}]
+        return []
+
+    def invoke(self, messages, **kwargs):
+        time.sleep(self.latency.sample())
+        burn_cpu(self.cpu_s)
+        tool_calls = self._tool_calls(messages) if self.with_tools and isinstance(messages, list) else []
+        for call in tool_calls:
+            call.update(id=f"call_{uuid.uuid4().hex[:12]}", type="tool_call")
+        prompt_tokens = len(json.dumps(messages, default=str)) // 4
+        return AIMessage(
+            content="" if tool_calls else REPLY,
+            tool_calls=tool_calls,
+            usage_metadata={"input_tokens": prompt_tokens, "output_tokens": 60,
+                            "total_tokens": prompt_tokens + 60},
+        )
+
+
+def burn_cpu(seconds: float):
+    """Pure-Python busy work that holds the GIL for `seconds`"""
+    end = time.thread_time() + seconds
+    while time.thread_time() < end:
+        json.loads(json.dumps({"role": "assistant", "content": REPLY * 4}))
+
+
+class FakeSearch:
+    def __init__(self, latency: LogNormal):
+        self.latency = latency
+
+    def invoke(self, query):
+        time.sleep(self.latency.sample())
+        return {"query": query, "results": [{"title": "Box breathing", "content": "Inhale for four counts..."}]}
+
+
+def fake_smtp(latency: LogNormal):
+    class FakeSMTP:
+        def __init__(self, host, port):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def starttls(self):
+            time.sleep(latency.sample() / 3)
+
+        def login(self, user, password):
+            time.sleep(latency.sample() / 3)
+
+        def send_message(self, msg):
+            time.sleep(latency.sample() / 3)
+
+    return FakeSMTP
+
+
+def install_fakes(options: dict):
+    """Swap logic's LLM, search and SMTP backends for fakes (in this process)"""
+    scale = options["time_scale"]
+    llm_latency = LogNormal(options["llm_s"], 0.5, scale)
+    cpu_s = options["cpu_ms"] / 1000
+    logic.router.model_factory = lambda name: FakeChatModel(llm_latency, options["search_rate"], cpu_s)
+    logic.router.admission = AdmissionController(period=60 * scale)
+    logic.TAVILY = FakeSearch(LogNormal(options["search_s"], 0.4, scale))
+    logic.smtplib.SMTP = fake_smtp(LogNormal(options["smtp_s"], 0.3, scale))
+
+
+def fake_graph():
+    """GraphWorkerPool factory: the graph on fakes configured by the parent via LOADTEST_FAKES"""
+    install_fakes(json.loads(os.environ["LOADTEST_FAKES"]))
+    return logic.create_graph(MemorySaver())
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class StepStats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.peak_threads = threading.active_count()
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float = None):
+        with self._lock:
+            if seconds is None:
+                self.errors += 1
+            else:
+                self.latencies.append(seconds)
+
+
+def run_session(app, turns: int, think: LogNormal, stats: StepStats):
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    for turn in range(turns):
+        time.sleep(think.sample())
+        text = FINAL_LINE if turn == turns - 1 else random.choice(USER_LINES)
+        start = time.perf_counter()
+        try:
+            app.invoke({"messages": [{"role": "user", "content": text}]}, config=config)
+            stats.record(time.perf_counter() - start)
+        except Exception as e:
+            print(f"❌ Turn failed: {e}")
+            stats.record(None)
+
+
+def run_step(app, sessions: int, turns: int, think: LogNormal) -> dict:
+    stats = StepStats()
+    done = threading.Event()
+
+    def monitor():
+        while not done.wait(0.1):
+            stats.peak_threads = max(stats.peak_threads, threading.active_count())
+
+    rss_before = rss_mb()
+    watcher = threading.Thread(target=monitor, daemon=True)
+    watcher.start()
+    workers = [threading.Thread(target=run_session, args=(app, turns, think, stats), daemon=True)
+               for _ in range(sessions)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    wall = time.perf_counter() - start
+    done.set()
+    watcher.join()
+
+    lat = stats.latencies or [0.0]
+    return {
+        "sessions": sessions,
+        "turns": len(stats.latencies),
+        "errors": stats.errors,
+        "p50_ms": round(percentile(lat, 50) * 1000, 1),
+        "p95_ms": round(percentile(lat, 95) * 1000, 1),
+        "p99_ms": round(percentile(lat, 99) * 1000, 1),
+        "turns_per_s": round(len(stats.latencies) / wall, 2),
+        "rss_mb": round(rss_mb(), 1),
+        "rss_growth_mb": round(rss_mb() - rss_before, 1),
+        "peak_threads": stats.peak_threads,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ramp", default="10,50,100,200", help="comma-separated concurrent session counts")
+    parser.add_argument("--turns", type=int, default=6, help="turns per session (last one ends the session)")
+    parser.add_argument("--think-s", type=float, default=8.0, help="median user think time")
+    parser.add_argument("--llm-s", type=float, default=1.2, help="median LLM latency")
+    parser.add_argument("--search-s", type=float, default=0.6, help="median web search latency")
+    parser.add_argument("--smtp-s", type=float, default=0.9, help="median SMTP send latency")
+    parser.add_argument("--search-rate", type=float, default=0.1, help="share of turns that call search_web")
+    parser.add_argument("--cpu-ms", type=float, default=0.0, help="GIL-holding CPU time per LLM call")
+    parser.add_argument("--workers", type=int, default=0, help="run the graph in N worker processes")
+    parser.add_argument("--time-scale", type=float, default=0.1)
+    parser.add_argument("--json", help="also write the step results to this file")
+    args = parser.parse_args()
+
+    scale = args.time_scale
+    think = LogNormal(args.think_s, 0.6, scale)
+    options = {k: getattr(args, k) for k in ("llm_s", "search_s", "smtp_s", "search_rate", "cpu_ms", "time_scale")}
+    if args.workers:
+        os.environ["LOADTEST_FAKES"] = json.dumps(options)
+        app = GraphWorkerPool("benchmarks.loadtest:fake_graph", workers=args.workers)
+    else:
+        install_fakes(options)
+        app = logic.create_graph(MemorySaver())
+    results = []
+    if scale != 1:
+        print(f"ℹ️ Latencies are in compressed time (x{scale}); use --time-scale 1 for absolute numbers")
+    print(f"{'sessions':>8} {'turns':>6} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'turns/s':>8} {'rss MB':>8} {'+rss MB':>8} {'threads':>8}")
+    for sessions in [int(n) for n in args.ramp.split(",")]:
+        r = run_step(app, sessions, args.turns, think)
+        results.append(r)
+        print(f"{r['sessions']:>8} {r['turns']:>6} {r['errors']:>4} {r['p50_ms']:>8} {r['p95_ms']:>8} "
+              f"{r['p99_ms']:>8} {r['turns_per_s']:>8} {r['rss_mb']:>8} {r['rss_growth_mb']:>8} {r['peak_threads']:>8}")
+
+    if args.workers:
+        print(f"🧵 {app.stats()}")
+        app.close()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "steps": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# flake8: noqa
+"""
+Benchmarks the long-term memory index: embedding throughput, index memory
+and top-k retrieval latency for one user holding --size memories.
+
+    python -m benchmarks.memory_index --size 100000 --queries 200
+"""
+import argparse
+import random
+import time
+
+from long_term_memory import HashingEmbedder, MemoryIndex
+from benchmarks.fakes import percentile
+
+SUBJECTS = ["work", "sleep", "my sister", "my manager", "exams", "my partner", "money", "running",
+            "panic attacks", "my dad", "moving house", "loneliness", "social media", "my health"]
+FEELINGS = ["anxious", "exhausted", "hopeful", "angry", "numb", "overwhelmed", "calmer", "guilty"]
+HELPERS = ["box breathing", "journaling", "a short walk", "calling a friend", "setting boundaries",
+           "a wind-down routine", "grounding exercises", "limiting caffeine"]
+
+
+def synthetic_memory(rng: random.Random) -> str:
+    return (f"User feels {rng.choice(FEELINGS)} about {rng.choice(SUBJECTS)}; "
+            f"{rng.choice(HELPERS)} helped after {rng.choice(SUBJECTS)} came up.")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    embedder = HashingEmbedder()
+    index = MemoryIndex(embedder.dim)
+
+    start = time.perf_counter()
+    for offset in range(0, args.size, args.batch):
+        texts = [synthetic_memory(rng) for _ in range(min(args.batch, args.size - offset))]
+        index.add(embedder.embed(texts), [{"text": t} for t in texts])
+    build_s = time.perf_counter() - start
+
+    queries = [f"I've been feeling {rng.choice(FEELINGS)} about {rng.choice(SUBJECTS)}" for _ in range(args.queries)]
+    embed_ms, search_ms = [], []
+    for query in queries:
+        t0 = time.perf_counter()
+        vector = embedder.embed([query])[0]
+        t1 = time.perf_counter()
+        index.search(vector, args.k)
+        t2 = time.perf_counter()
+        embed_ms.append((t1 - t0) * 1000)
+        search_ms.append((t2 - t1) * 1000)
+
+    print(f"memories        {len(index):,}  (dim={embedder.dim}, float32)")
+    print(f"index memory    vectors {index.vectors.nbytes / 2**20:.1f} MiB used, "
+          f"{index.nbytes / 2**20:.1f} MiB allocated")
+    print(f"build           {build_s:.1f}s  ({len(index) / build_s:,.0f} memories/s embedded+indexed)")
+    print(f"query embed     p50={percentile(embed_ms, 50):.3f}ms  p95={percentile(embed_ms, 95):.3f}ms")
+    print(f"top-{args.k} search    p50={percentile(search_ms, 50):.2f}ms  p95={percentile(search_ms, 95):.2f}ms  "
+          f"p99={percentile(search_ms, 99):.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# flake8: noqa
+"""
+Fires a burst of concurrent chat (interactive) and report (background) calls
+from several tenants at a fake endpoint that enforces a request limit, with
+and without AdmissionController in front. Time is scaled so one "minute" of
+budget is `--window` seconds.
+
+    python -m benchmarks.rate_limits --tenants 8 --calls-per-tenant 10
+"""
+import argparse
+import threading
+import time
+
+from admission import AdmissionController, AdmissionTimeout
+from benchmarks.fakes import RateLimitedModel, RateLimitError
+
+
+def burst(model, tenants: int, calls: int, admission=None):
+    outcomes = {"ok": 0, "429": 0, "timeout": 0}
+    lock = threading.Lock()
+
+    def worker(tenant: str, lane: str):
+        try:
+            if admission is not None:
+                admission.acquire(tenant, 300, lane)
+            model.invoke([{"role": "user", "content": "hi"}])
+            result = "ok"
+        except RateLimitError:
+            result = "429"
+        except AdmissionTimeout:
+            result = "timeout"
+        with lock:
+            outcomes[result] += 1
+
+    threads = []
+    for t in range(tenants):
+        for i in range(calls):
+            lane = "background" if i % 5 == 4 else "interactive"
+            threads.append(threading.Thread(target=worker, args=(f"tenant-{t}", lane)))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tenants", type=int, default=8)
+    parser.add_argument("--calls-per-tenant", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=20, help="provider requests per window")
+    parser.add_argument("--window", type=float, default=1.0)
+    args = parser.parse_args()
+
+    outcomes, elapsed = burst(RateLimitedModel(args.limit, args.window), args.tenants, args.calls_per_tenant)
+    print(f"no admission   {outcomes}  {elapsed:.2f}s")
+
+    # A full bucket plus one window of refill must fit inside the provider's
+    # sliding-window limit, so the global bucket is sized at half of it
+    admission = AdmissionController(
+        global_rpm=args.limit // 2, global_tpm=args.limit * 1000,
+        tenant_rpm=max(1, args.limit // 4), tenant_tpm=args.limit * 500,
+        period=args.window, timeout=30,
+    )
+    outcomes, elapsed = burst(RateLimitedModel(args.limit, args.window), args.tenants, args.calls_per_tenant, admission)
+    print(f"with admission {outcomes}  {elapsed:.2f}s")
+    for lane, stats in admission.metrics().items():
+        print(f"  {lane:<12} {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# flake8: noqa
+"""
+Offline comparison of binding every tool on every chatbot call against
+phase-aware binding (session_phase.py). Scripted sessions run through
+logic.create_graph with a fake model that sends the real tool schemas'
+size as prompt tokens, makes the calls the script needs, and with
+probability --spurious-rate per offered-but-irrelevant tool makes a
+spurious call (each one costs an extra chatbot round trip).
+
+    python -m benchmarks.tool_binding --sessions 200 --turns 8
+"""
+import argparse
+import json
+import random
+import uuid
+
+from langchain_core.messages import AIMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langgraph.checkpoint.memory import MemorySaver
+
+import benchmarks.loadtest as loadtest  # sets dummy credentials before importing logic
+import logic
+from session_phase import PHASE_TOOLS
+
+SPURIOUS_ARGS = {
+    "search_web": {"query": "coping strategies"},
+    "detect_session_end": {"conversation": "User: ok"},
+    "extract_email_from_text": {"text": "ok"},
+    "validate_email": {"email": "someone@example.com"},
+    "analyze_therapy_session": {},
+    "send_analysis_email": {"email": "someone@example.com", "analysis": "report"},
+}
+
+
+class Counters:
+    def __init__(self):
+        self.chat_calls = 0
+        self.schema_tokens = 0
+        self.prompt_tokens = 0
+        self.tool_calls = 0
+        self.spurious_calls = 0
+
+
+class SchemaCountingModel:
+    """Fake chat model that accounts for the schemas of the tools bound to it"""
+
+    def __init__(self, counters: Counters, rng: random.Random, spurious_rate: float, search_rate: float,
+                 tools=None):
+        self.counters = counters
+        self.rng = rng
+        self.spurious_rate = spurious_rate
+        self.search_rate = search_rate
+        self.tools = tools or []
+        self.names = [t.name for t in self.tools]
+        self.schema_tokens = len(json.dumps([convert_to_openai_tool(t) for t in self.tools])) // 4 if tools else 0
+
+    def bind_tools(self, tools):
+        return SchemaCountingModel(self.counters, self.rng, self.spurious_rate, self.search_rate, tools)
+
+    def _calls(self, last_user: str) -> list:
+        needed = {}
+        if "Goodbye" in last_user:
+            needed = {"analyze_therapy_session": {},
+                      "send_analysis_email": {"email": "loadtest.user@example.com", "analysis": "# Report"}}
+        elif self.rng.random() < self.search_rate:
+            needed = {"search_web": {"query": last_user}}
+        needed = {n: a for n, a in needed.items() if n in self.names}
+        spurious = [n for n in self.names if n not in needed and self.rng.random() < self.spurious_rate]
+        self.counters.spurious_calls += len(spurious)
+        return [{"name": n, "args": a} for n, a in needed.items()] + \
+               [{"name": n, "args": SPURIOUS_ARGS[n]} for n in spurious]
+
+    def invoke(self, messages, **kwargs):
+        if not isinstance(messages, list) or not messages or not isinstance(messages[0], dict):
+            return AIMessage(content="Session continues")  # side tasks: end detection, report
+        self.counters.chat_calls += 1
+        self.counters.schema_tokens += self.schema_tokens
+        self.counters.prompt_tokens += len(json.dumps(messages)) // 4 + self.schema_tokens
+        last = messages[-1]
+        # Only answer a fresh user message with tool calls; after tool results, reply in text
+        calls = self._calls(last["content"]) if last.get("role") == "user" and self.tools else []
+        for call in calls:
+            call.update(id=f"call_{uuid.uuid4().hex[:12]}", type="tool_call")
+        self.counters.tool_calls += len(calls)
+        return AIMessage(content="" if calls else loadtest.REPLY, tool_calls=calls)
+
+
+def run(phased: bool, args) -> Counters:
+    counters = Counters()
+    rng = random.Random(args.seed)
+    logic.PHASED_TOOLS = phased
+    logic.router.model_factory = lambda name: SchemaCountingModel(counters, rng, args.spurious_rate, args.search_rate)
+    logic.router._models.clear()
+    logic.router._bound.clear()
+    app = logic.create_graph(MemorySaver())
+    for _ in range(args.sessions):
+        config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+        for turn in range(args.turns):
+            text = loadtest.FINAL_LINE if turn == args.turns - 1 else rng.choice(loadtest.USER_LINES)
+            app.invoke({"messages": [{"role": "user", "content": text}]}, config=config)
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=8, help="user turns per session (last one ends it)")
+    parser.add_argument("--spurious-rate", type=float, default=0.03,
+                        help="chance per call that each offered, irrelevant tool is called anyway")
+    parser.add_argument("--search-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    loadtest.install_fakes({"llm_s": 1.0, "search_s": 1.0, "smtp_s": 1.0, "search_rate": 0.0,
+                            "cpu_ms": 0.0, "time_scale": 0.0001})
+    schema = {phase: len(json.dumps([convert_to_openai_tool(t) for t in logic.tools if t.name in names])) // 4
+              if names else 0 for phase, names in PHASE_TOOLS.items()}
+    print("tool schema tokens per call: all=%d  " % (len(json.dumps([convert_to_openai_tool(t) for t in logic.tools])) // 4)
+          + "  ".join(f"{p}={n}" for p, n in schema.items()))
+
+    results = {"all tools": run(False, args), "phased": run(True, args)}
+    per = args.sessions
+    print(f"{'binding':<10} {'round trips':>12} {'tool calls':>11} {'spurious':>9} {'schema tok':>11} {'prompt tok':>11}   (per session)")
+    for label, c in results.items():
+        print(f"{label:<10} {c.chat_calls / per:>12.2f} {c.tool_calls / per:>11.2f} {c.spurious_calls / per:>9.2f} "
+              f"{c.schema_tokens / per:>11.0f} {c.prompt_tokens / per:>11.0f}")
+    base, phased = results["all tools"], results["phased"]
+    print(f"saved per session: {(base.schema_tokens - phased.schema_tokens) / per:.0f} schema tokens "
+          f"({1 - phased.schema_tokens / base.schema_tokens:.0%}), "
+          f"{(base.chat_calls - phased.chat_calls) / per:.2f} chatbot round trips")
+
+
+if __name__ == "__main__":
+    main()
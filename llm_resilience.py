@@ -0,0 +1,216 @@
+# flake8: noqa
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when the primary model's breaker is open and no fallback is available"""
+
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies (seconds)"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, p: float):
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class CircuitBreaker:
+    """
+    Opens when the error rate over the last `window` calls reaches `threshold`.
+    After `cooldown` seconds a single trial call is let through (half-open);
+    success closes the breaker, failure re-opens it.
+    """
+
+    def __init__(self, window: int = 20, threshold: float = 0.5, min_calls: int = 5,
+                 cooldown: float = 30.0):
+        self.window = window
+        self.threshold = threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.state = "closed"
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def release(self):
+        """Hand back a half-open trial slot whose call was never sent"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record(self, success: bool):
+        with self._lock:
+            if self.state == "half_open":
+                self._trial_in_flight = False
+                if success:
+                    self.state = "closed"
+                    self._outcomes.clear()
+                else:
+                    self._trip()
+                return
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.threshold:
+                self._trip()
+
+    def _trip(self):
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        print("⚡ Circuit breaker opened — failing over to secondary model")
+
+
+class _Attempt:
+    """Run/finish times of one model call, taken on the worker thread"""
+
+    def __init__(self):
+        self.begun = threading.Event()
+        self.started = None
+        self.finished = None
+
+    def run(self, fn, *args, **kwargs):
+        self.started = time.monotonic()
+        self.begun.set()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.finished = time.monotonic()
+
+    def elapsed(self) -> float:
+        return self.finished - self.started
+
+
+class ResilientCaller:
+    """
+    Wraps blocking model calls with a deadline, a single hedged duplicate once
+    the call outlives the observed p95, and a circuit breaker that fails over
+    to a secondary model when errors spike. One caller is kept per model so
+    latency history and breaker state are per model.
+    """
+
+    # Shared by every caller in the process. Size it to about twice the peak number of
+    # concurrent LLM calls (each may add a hedge); queue time here is not counted as latency.
+    _executor = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_CALL_WORKERS", "32")),
+                                   thread_name_prefix="llm-call")
+
+    def __init__(self, deadline: float = None, hedge_percentile: float = 95,
+                 min_samples: int = 20, breaker: CircuitBreaker = None):
+        self.deadline = deadline or float(os.getenv("LLM_DEADLINE_S", "45"))
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.latency = LatencyTracker()
+        self.breaker = breaker or CircuitBreaker()
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+    def hedge_delay(self):
+        """Seconds to wait before sending the hedge, or None while history is too short"""
+        if len(self.latency) < self.min_samples:
+            return None
+        return self.latency.percentile(self.hedge_percentile)
+
+    def invoke(self, primary, messages, fallback=None, admit=None, **kwargs):
+        """
+        `admit(blocking)` is called before every request actually sent (primary,
+        hedge or fallback) so rate limiting sees each one; a non-blocking call
+        returns False when there is no capacity, and the hedge is skipped.
+        """
+        admit = admit or (lambda blocking=True: True)
+        if not self.breaker.allow():
+            if fallback is None:
+                raise CircuitOpenError("Primary model unavailable and no fallback configured")
+            admit()
+            return fallback.invoke(messages, **kwargs)
+
+        try:
+            admit()
+        except Exception:
+            # Nothing reached the model; don't let a half-open trial slot leak
+            self.breaker.release()
+            raise
+        try:
+            result = self._hedged(primary, messages, admit, **kwargs)
+        except Exception:
+            self.breaker.record(False)
+            raise
+        self.breaker.record(True)
+        return result
+
+    def _submit(self, model, messages, **kwargs):
+        # Each attempt runs in its own copy of the caller's context (config, trace span)
+        attempt = _Attempt()
+        future = self._executor.submit(contextvars.copy_context().run, attempt.run, model.invoke, messages, **kwargs)
+        future.attempt = attempt
+        return future
+
+    def _hedged(self, model, messages, admit, **kwargs):
+        deadline_at = time.monotonic() + self.deadline
+        primary = self._submit(model, messages, **kwargs)
+        pending = {primary}
+        hedge = None
+
+        delay = self.hedge_delay()
+        # The hedge clock starts when a worker picks the call up: a call still queued
+        # behind a busy executor isn't slow, and a duplicate would only queue behind it
+        if delay is not None and primary.attempt.begun.wait(max(0.0, deadline_at - time.monotonic())):
+            hedge_at = min(primary.attempt.started + delay, deadline_at)
+            done, pending = wait(pending, timeout=max(0.0, hedge_at - time.monotonic()))
+            if not done and time.monotonic() < deadline_at and admit(blocking=False):
+                hedge = self._submit(model, messages, **kwargs)
+                pending.add(hedge)
+                self.hedges_sent += 1
+            pending |= done
+
+        error = None
+        while pending:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                for loser in pending:
+                    loser.cancel()
+                if future is hedge:
+                    self.hedges_won += 1
+                self.latency.record(future.attempt.elapsed())
+                return future.result()
+
+        for loser in pending:
+            loser.cancel()
+        if error is not None:
+            raise error
+        raise TimeoutError(f"LLM call exceeded {self.deadline:.0f}s deadline")
@@ -1,15 +1,13 @@
 # flake8: noqa
-from langchain.chat_models import init_chat_model
 from dotenv import load_dotenv
 from typing import Annotated
-from typing_extensions import TypedDict
 from langgraph.graph import StateGraph, START, END
-from langgraph.graph.message import add_messages
 from langgraph.checkpoint.mongodb import MongoDBSaver
 from langchain_tavily import TavilySearch
-from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.prebuilt import ToolNode, InjectedState, tools_condition
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.tools import tool
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 import json
 import uuid
 import pyttsx3
@@ -21,20 +19,42 @@ from email.mime.multipart import MIMEMultipart
 import os
 import speech_recognition as sr
 import asyncio
+import contextvars
+import threading
+import time
 from openai import AsyncOpenAI
-from openai.helpers import LocalAudioPlayer
+import numpy as np
+from model_router import ModelRouter
+from session_state import State, conversation_history, last_user_text
+from transcript_store import bind_transcript_store
+from session_phase import session_phase, bind_for_phases
+from long_term_memory import LongTermMemory, memory_user_id, memory_prompt
+from speculative import SpeculativeDrafter
+from session_archive import SessionArchive, session_record
+from tracing import tracer, instrument_tools, traced_checkpointer
+from tts_cache import TTSCache
+from tts_render import TTS_MODEL, TTS_VOICE, TTS_INSTRUCTIONS
+from audio_output import AudioOutput
+from llm_resilience import LatencyTracker
 load_dotenv()
 
-# Define state
-class State(TypedDict):
-    messages: Annotated[list, add_messages]
-    conversation_history: list
-    user_email: str | None
-    session_ended: bool
+# Initialize LLMs (each task type is routed to its configured model tier)
+router = ModelRouter()
+llm = router.for_task("chat")
+end_detector_llm = router.for_task("end_detection")
+analyzer_llm = router.for_task("report")
+summarizer_llm = router.for_task("summarization")
 
-# Initialize LLMs
-llm = init_chat_model(model_provider="openai", model="gpt-4.1")
-analyzer_llm = init_chat_model(model_provider="openai", model="gpt-4.1")
+# Cross-session memory, keyed by USER_ID for the CLI
+memory = LongTermMemory()
+USER_ID = os.getenv("USER_ID", "local-user")
+
+# Finished sessions are archived outside the checkpoint store (ARCHIVE_DIR="" disables it)
+archive = SessionArchive()
+
+# Opt-in speculative drafting from partial transcripts in the voice loop
+SPECULATIVE_DRAFTS = os.getenv("SPECULATIVE_DRAFTS", "0") == "1"
+SPECULATIVE_PAUSE_S = float(os.getenv("SPECULATIVE_PAUSE_S", "0.8"))
 
 # Email configuration
 SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
@@ -42,13 +62,44 @@ SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
 EMAIL_ADDRESS = os.getenv("EMAIL")
 EMAIL_PASSWORD = os.getenv("APP_PASSWORD")
 
-TAVILY = TavilySearch(max_results=2)
+TAVILY = None  # created on first search; web search is optional
+
+def tavily():
+    """Tavily client, created on first use; None when TAVILY_API_KEY is not configured"""
+    global TAVILY
+    if TAVILY is None and os.getenv("TAVILY_API_KEY"):
+        try:
+            TAVILY = TavilySearch(max_results=2)
+        except Exception as e:
+            print(f"⚠️ Tavily search unavailable: {e}")
+    return TAVILY
 
 openai = AsyncOpenAI()
 
-def speak_local(text: str):
+# Raw PCM keeps local playback simple; voice settings live in tts_render
+TTS_FORMAT = "pcm"
+
+# Fixed lines spoken every session; pre-warmed into the TTS cache at startup
+GREETING = "Hey there — I'm really glad you made time to be here today. No rush at all. Let's just take it easy. How has your day been going so far?"
+RESET_GREETING = "Hey there — I'm really glad you made time to be here today. How has your day been going so far?"
+ERROR_APOLOGY = "I apologize, but I encountered a technical issue. Let's continue our conversation."
+FAREWELL = "Take care! Remember, you're stronger than you think. 💙"
+FIXED_PHRASES = [GREETING, RESET_GREETING, ERROR_APOLOGY, FAREWELL]
+
+tts_cache = TTSCache()
+
+# Jitter-buffered speaker output for streamed PCM (AUDIO_JITTER_MS, AUDIO_DEVICE=null for tests)
+audio_out = AudioOutput()
+
+# If OpenAI has produced no audio by this deadline, the local engine races it
+TTS_FIRST_AUDIO_DEADLINE_S = float(os.getenv("TTS_FIRST_AUDIO_DEADLINE_S", "1.5"))
+tts_first_audio = {provider: LatencyTracker() for provider in ("cache", "openai", "local")}
+
+def speak_local(text: str, on_start=None, should_stop=None):
     """
     Fallback text-to-speech using pyttsx3 (offline).
+    on_start is called when audio starts and may return False to stop it
+    (e.g. it lost a race); should_stop is checked just before.
     """
     engine = pyttsx3.init()
     engine.setProperty('rate', 165)
@@ -58,59 +109,240 @@ def speak_local(text: str):
     if voices:
         engine.setProperty('voice', voices[0].id)  # Choose different index if needed
 
+    def started(name):
+        if (should_stop and should_stop()) or (on_start and on_start() is False):
+            engine.stop()
+
+    engine.connect('started-utterance', started)
+    if should_stop and should_stop():
+        return
     engine.say(text)
     engine.runAndWait()
 
 
+def tts_cache_key(text: str) -> str:
+    return tts_cache.key(text, TTS_VOICE, TTS_INSTRUCTIONS, TTS_FORMAT, TTS_MODEL)
+
+
+async def synthesize_speech(text: str) -> bytes:
+    """
+    Renders text to raw 24kHz 16-bit mono PCM using OpenAI's streaming TTS API.
+    """
+    async with openai.audio.speech.with_streaming_response.create(
+        model=TTS_MODEL,
+        voice=TTS_VOICE,
+        input=text,
+        instructions=TTS_INSTRUCTIONS,
+        response_format=TTS_FORMAT,
+    ) as response:
+        return await response.read()
+
+
+async def stream_speech(text: str):
+    """
+    Yields raw PCM chunks as OpenAI's streaming TTS API delivers them, and
+    caches the full utterance once the stream completes.
+    """
+    audio = bytearray()
+    async with openai.audio.speech.with_streaming_response.create(
+        model=TTS_MODEL,
+        voice=TTS_VOICE,
+        input=text,
+        instructions=TTS_INSTRUCTIONS,
+        response_format=TTS_FORMAT,
+    ) as response:
+        async for chunk in response.iter_bytes():
+            audio += chunk
+            yield chunk
+    tts_cache.put(tts_cache_key(text), bytes(audio))
+
+
+async def prewarm_tts(phrases: list):
+    """
+    Synthesizes any fixed phrases missing from the TTS cache, concurrently.
+    """
+    missing = [p for p in phrases if not tts_cache.contains(tts_cache_key(p))]
+    if not missing:
+        return
+    results = await asyncio.gather(*(synthesize_speech(p) for p in missing), return_exceptions=True)
+    for phrase, audio in zip(missing, results):
+        if isinstance(audio, Exception):
+            print(f"⚠️ Could not pre-warm TTS for {phrase[:30]!r}: {audio}")
+        else:
+            tts_cache.put(tts_cache_key(phrase), audio)
+
+
+class _Race:
+    """First provider to claim the utterance wins; claims come from the event loop and the local engine thread"""
+
+    def __init__(self):
+        self.winner = None
+        self._lock = threading.Lock()
+
+    def claim(self, provider: str) -> bool:
+        with self._lock:
+            if self.winner is None:
+                self.winner = provider
+            return self.winner == provider
+
+
+async def race_speech(text: str, span):
+    """
+    Streams OpenAI TTS; if no audio arrives within TTS_FIRST_AUDIO_DEADLINE_S,
+    starts the local engine in parallel. Whichever produces audio first plays
+    and the other is cancelled. Returns (provider, first_audio_s).
+    """
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    chunks = stream_speech(text)
+    first_chunk = asyncio.ensure_future(chunks.__anext__())
+    await asyncio.wait({first_chunk}, timeout=TTS_FIRST_AUDIO_DEADLINE_S)
+
+    if not first_chunk.done():
+        span.set(deadline_missed=True)
+        race = _Race()
+        local_started = loop.create_future()
+
+        def on_local_start() -> bool:
+            # The cloud can win between should_stop() and this claim; False stops the engine
+            if not race.claim("local"):
+                return False
+            at = time.perf_counter()
+            loop.call_soon_threadsafe(lambda: local_started.done() or local_started.set_result(at))
+            return True
+
+        local = loop.run_in_executor(None, lambda: speak_local(
+            text, on_start=on_local_start, should_stop=lambda: race.winner == "openai"))
+        contenders = {first_chunk, local}
+        while race.winner is None and contenders:
+            done, _ = await asyncio.wait(contenders | {local_started}, return_when=asyncio.FIRST_COMPLETED)
+            if first_chunk in done and first_chunk.exception() is None:
+                race.claim("openai")
+            contenders -= done
+
+        if race.winner == "local":
+            first_chunk.cancel()
+            await asyncio.gather(first_chunk, return_exceptions=True)
+            await chunks.aclose()
+            print("⏱️ Cloud voice missed the first-audio deadline — using the local voice")
+            first_audio = await local_started - started
+            await local
+            return "local", first_audio
+        # The local engine stops itself when it sees the cloud won; don't leak its errors
+        local.add_done_callback(lambda f: f.exception())
+
+    head = first_chunk.result()  # raises the cloud error if neither provider produced audio
+    first_audio = time.perf_counter() - started
+
+    async def stream():
+        yield head
+        async for chunk in chunks:
+            yield chunk
+
+    stats = await audio_out.play_stream(stream())
+    span.set(audio_bytes=stats.bytes_played, underruns=stats.underruns, underrun_ms=round(stats.underrun_ms, 1))
+    return "openai", first_audio + (stats.time_to_first_sample_ms or 0.0) / 1000
+
+
 async def speak_therapist_response(text: str):
     """
-    Streams TTS playback of the therapist's response using OpenAI's streaming API.
+    Plays the therapist's response, serving cached audio when available and
+    racing streamed OpenAI TTS against the local engine otherwise.
     Falls back to offline TTS if OpenAI fails.
     """
-    instructions = (
-        "Speak with a calm, grounded, emotionally intelligent human tone — "
-        "gentle, warm, patient, and deeply compassionate. Sound like an experienced therapist "
-        "who genuinely cares, validating emotions without sounding robotic or clinical."
-    )
-
+    key = tts_cache_key(text)
+    with tracer.span("tts", chars=len(text)) as span:
+        try:
+            with tts_cache.read(key) as cached:
+                if cached is not None:
+                    stats = await audio_out.play(cached)
+                    provider, first_audio = "cache", (stats.time_to_first_sample_ms or 0.0) / 1000
+                    span.set(audio_bytes=stats.bytes_played)
+            if cached is None:
+                provider, first_audio = await race_speech(text, span)
+            tts_first_audio[provider].record(first_audio)
+            span.set(provider=provider, first_audio_ms=round(first_audio * 1000, 1))
+
+        except Exception as e:
+            print(f"🔁 OpenAI TTS failed: {e}")
+            print("🎤 Falling back to local speech engine...")
+            span.set(provider="local", error=str(e))
+            speak_local(text)
+
+
+def tts_report() -> str:
+    parts = []
+    for provider, latency in tts_first_audio.items():
+        if len(latency):
+            parts.append(f"{provider} {len(latency)}x (p50 {latency.percentile(50) * 1000:.0f}ms)")
+    return "🔊 First audio: " + (", ".join(parts) or "no utterances")
+
+def _transcribe_partial(recognizer, audio, on_partial):
     try:
-        async with openai.audio.speech.with_streaming_response.create(
-            model="gpt-4o-mini-tts",
-            voice="nova",  # You can also try 'shimmer', 'coral', etc.
-            input=text,
-            instructions=instructions,
-            response_format="pcm",
-        ) as response:
-            await LocalAudioPlayer().play(response)
+        on_partial(recognizer.recognize_google(audio))
+    except (sr.UnknownValueError, sr.RequestError):
+        pass
 
-    except Exception as e:
-        print(f"🔁 OpenAI TTS failed: {e}")
-        print("🎤 Falling back to local speech engine...")
-        speak_local(text)
 
-def recognize_from_mic():
+def listen_with_partials(recognizer, source, on_partial, pause_s: float):
+    """
+    Streams microphone audio like recognizer.listen(). Each time the speaker
+    pauses for `pause_s` (shorter than the end-of-turn pause), the audio so far
+    is transcribed in the background and passed to on_partial.
+    """
+    chunks = []
+    quiet_s = 0.0
+    armed = False
+    for chunk in recognizer.listen(source, stream=True):
+        data = chunk.get_raw_data()
+        chunks.append(data)
+        samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+        energy = float(np.sqrt(np.mean(samples ** 2))) if samples.size else 0.0
+        if energy > recognizer.energy_threshold:
+            quiet_s, armed = 0.0, True
+        else:
+            quiet_s += len(data) / (source.SAMPLE_RATE * source.SAMPLE_WIDTH)
+        if armed and quiet_s >= pause_s:
+            armed = False
+            snapshot = sr.AudioData(b"".join(chunks), source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+            # Partials may start a draft; it must see the turn's trace span
+            threading.Thread(target=contextvars.copy_context().run,
+                             args=(_transcribe_partial, recognizer, snapshot, on_partial), daemon=True).start()
+    return sr.AudioData(b"".join(chunks), source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+
+
+def recognize_from_mic(on_partial=None):
     recognizer = sr.Recognizer()
     recognizer.pause_threshold = 2.5  # Auto stop after ~2.5 sec silence
 
-    with sr.Microphone() as source:
-        print("🎙️ Listening... (speak now, will auto-stop after pause)")
-        audio = recognizer.listen(source)
-    
-    try:
-        text = recognizer.recognize_google(audio)
-        print("📝 You said:", text)
-        return text
-    except sr.UnknownValueError:
-        return "❌ Could not understand audio"
-    except sr.RequestError as e:
-        return f"❌ API error: {e}"
+    with tracer.span("stt.capture", speculative=on_partial is not None) as span:
+        with sr.Microphone() as source:
+            print("🎙️ Listening... (speak now, will auto-stop after pause)")
+            if on_partial is None:
+                audio = recognizer.listen(source)
+            else:
+                audio = listen_with_partials(recognizer, source, on_partial, SPECULATIVE_PAUSE_S)
+        span.set(audio_bytes=len(audio.get_raw_data()))
+
+        try:
+            text = recognizer.recognize_google(audio)
+            print("📝 You said:", text)
+            span.set(chars=len(text))
+            return text
+        except sr.UnknownValueError:
+            return "❌ Could not understand audio"
+        except sr.RequestError as e:
+            span.set(error=str(e))
+            return f"❌ API error: {e}"
 
 @tool
 def search_web(query: str) -> str:
     """Tool to perform web search for factual queries when therapy needs external information"""
+    if tavily() is None:
+        return "Web search not available"
     print("🌐 Performing search...")
     try:
-        result = TAVILY.invoke(query)
+        result = tavily().invoke(query)
         return json.dumps(result, indent=2)
     except Exception as e:
         return f"Search failed: {str(e)}"
@@ -181,18 +413,19 @@ Conversation:
 {conversation.strip()}
 \"\"\"
 """
-    response = llm.invoke([HumanMessage(content=prompt)])
+    response = end_detector_llm.invoke([HumanMessage(content=prompt)])
     print("DETECTING SESSION END",response.content)
     return response.content.strip()
 
 @tool
-def analyze_therapy_session(conversation_history: str) -> str:
-    """Generate comprehensive therapy session analysis"""
+def analyze_therapy_session(state: Annotated[dict, InjectedState]) -> str:
+    """Generate comprehensive therapy session analysis from the current session's transcript"""
+    transcript = conversation_history(state["messages"])
     analysis_prompt = f"""
     Create a personalized therapy session report for email delivery. Make it supportive and actionable.
 
     THERAPY SESSION CONVERSATION:
-    {conversation_history}
+    {transcript}
 
     Generate a report with this structure:
 
@@ -249,10 +482,14 @@ tools = [search_web, send_analysis_email, validate_email, detect_session_end, an
 # Bind tools to LLM
 llm_with_tools = llm.bind_tools(tools)
 
+# Only the current phase's tools are bound per call (PHASED_TOOLS=0 binds all of them)
+PHASED_TOOLS = os.getenv("PHASED_TOOLS", "1") == "1"
+llm_by_phase = bind_for_phases(llm, tools)
+
 # Tool node
-tool_node = ToolNode(tools)
+tool_node = ToolNode(instrument_tools(tools))
 
-def chatbot(state: State):
+def chatbot(state: State, config: RunnableConfig):
     """Main chatbot function"""
     # Get the last user message
     if not state["messages"]:
@@ -371,12 +608,25 @@ When you detect a session should end:
 1. Use detect_session_end tool to confirm
 2. If confirmed, naturally offer: "I'd love to send you a personalized summary of our session. Would you like me to email it to you? kindly spell your email address."
 3. When they provide email, use extract_email_from_text and validate_email
-4. Use analyze_therapy_session with the conversation history
+4. Use analyze_therapy_session (it reads the session transcript itself)
 5. Use send_analysis_email to deliver the report
 6. Provide warm closing message
 
 You are **Therapist Built by Aryan**. You're not here to fix people — you're here to walk beside them with presence, patience, and compassion."""
 
+    # Long-term memory is recalled once per session, from the opening message
+    memories = state.get("long_term_memories")
+    update = {}
+    if memories is None:
+        user_id = memory_user_id(config)
+        memories = memory.recall(user_id, last_user_text(state["messages"])) if user_id else []
+        update["long_term_memories"] = memories
+    system_prompt += memory_prompt(memories)
+
+    phase = session_phase(state["messages"], state.get("phase"))
+    if phase != state.get("phase"):
+        update["phase"] = phase
+
     # Prepare messages for LLM
     messages = [
         {"role": "system", "content": system_prompt}
@@ -392,8 +642,52 @@ You are **Therapist Built by Aryan**. You're not here to fix people — you're h
                 role = "user" if hasattr(msg, 'type') and msg.type == "human" else "assistant"
                 messages.append({"role": role, "content": msg.content})
     
-    response = llm_with_tools.invoke(messages)
-    return {"messages": [response]}
+    model = llm_by_phase[phase] if PHASED_TOOLS else llm_with_tools
+    response = model.invoke(messages)
+    return {"messages": [response], **update}
+
+
+def draft_reply(partial: str, app, config):
+    """Run the chatbot node on a partial transcript without touching the checkpoint"""
+    values = app.get_state(config).values
+    messages = list(values.get("messages", [])) + [HumanMessage(content=partial)]
+    # As a runnable, so the router sees the turn's config (tenant, thread usage) like a graph step would
+    update = RunnableLambda(chatbot).invoke({**values, "messages": messages}, config)
+    if update["messages"][-1].tool_calls:
+        return None  # needs the tool loop; let the graph run the turn
+    return update
+
+
+def commit_draft(app, config, user_text: str, update: dict):
+    """Record the final user turn and the drafted reply as if the graph had produced them"""
+    app.update_state(config, {**update, "messages": [HumanMessage(content=user_text), *update["messages"]]},
+                     as_node="chatbot")
+    return app.get_state(config).values
+
+
+def remember_session(app, config):
+    """Summarize the session on `config`'s thread into long-term memory"""
+    try:
+        messages = app.get_state(config).values.get("messages", [])
+        memory.remember_session(USER_ID, conversation_history(messages), summarizer_llm,
+                                thread_id=config["configurable"]["thread_id"])
+    except Exception as e:
+        print(f"⚠️ Could not save session to long-term memory: {e}")
+
+
+def archive_session(app, config, started_at: float, turn_ms: list):
+    """Archive the session on `config`'s thread with its timings and token usage"""
+    thread_id = config["configurable"]["thread_id"]
+    if not archive.enabled:
+        router.take_usage(thread_id)
+        return
+    try:
+        messages = app.get_state(config).values.get("messages", [])
+        if messages:
+            archive.append(session_record(messages, thread_id, USER_ID, started_at, turn_ms,
+                                          router.take_usage(thread_id)))
+    except Exception as e:
+        print(f"⚠️ Could not archive session: {e}")
 
 
 def create_graph(checkpointer):
@@ -416,7 +710,8 @@ def create_graph(checkpointer):
     graph.add_edge("tools", "chatbot")
     graph.add_edge("chatbot",END)
     
-    return graph.compile(checkpointer=checkpointer)
+    app = graph.compile(checkpointer=traced_checkpointer(checkpointer))
+    return bind_transcript_store(app, checkpointer)
 
 # Main execution
 if __name__ == "__main__":
@@ -426,58 +721,75 @@ if __name__ == "__main__":
     print("Commands: /reset (new session), /quit (exit)")
     print("="*60)
     
-    conversation_history = []
-    
     with MongoDBSaver.from_conn_string(DB_URI) as checkpointer:
         app = create_graph(checkpointer)
-        config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+        config = {"configurable": {"thread_id": str(uuid.uuid4()), "user_id": USER_ID}}
+        session_started, turn_ms = time.time(), []
         
+        asyncio.run(prewarm_tts(FIXED_PHRASES))
+
         # Initial greeting
-        print("\nTherapist: Hey there — I'm really glad you made time to be here today. No rush at all. Let's just take it easy. How has your day been going so far?")
+        print(f"\nTherapist: {GREETING}")
+        asyncio.run(speak_therapist_response(GREETING))
+        
+        drafter = SpeculativeDrafter(draft_reply) if SPECULATIVE_DRAFTS else None
         
         while True:
-            user_input = recognize_from_mic()
+            with tracer.trace("turn", thread_id=config["configurable"]["thread_id"]):
+                on_partial = (lambda partial: drafter.propose(partial, app, config)) if drafter else None
+                user_input = recognize_from_mic(on_partial)
             
-            if user_input.lower() == "/reset":
-                config = {"configurable": {"thread_id": str(uuid.uuid4())}}
-                conversation_history = []
-                print("🔄 New session started.")
-                print("Therapist: Hey there — I'm really glad you made time to be here today. How has your day been going so far?")
-                continue
+                if drafter and user_input.lower() in ["/reset", "/quit", "/exit"]:
+                    drafter.cancel()
             
-            if user_input.lower() in ["/quit", "/exit"]:
-                print("Take care! Remember, you're stronger than you think. 💙")
-                break
+                if user_input.lower() == "/reset":
+                    remember_session(app, config)
+                    archive_session(app, config, session_started, turn_ms)
+                    config = {"configurable": {"thread_id": str(uuid.uuid4()), "user_id": USER_ID}}
+                    session_started, turn_ms = time.time(), []
+                    print("🔄 New session started.")
+                    print(f"Therapist: {RESET_GREETING}")
+                    asyncio.run(speak_therapist_response(RESET_GREETING))
+                    continue
             
-            # Add to conversation history
-            conversation_history.append(f"User: {user_input}")
+                if user_input.lower() in ["/quit", "/exit"]:
+                    remember_session(app, config)
+                    archive_session(app, config, session_started, turn_ms)
+                    print(tts_report())
+                    print(FAREWELL)
+                    asyncio.run(speak_therapist_response(FAREWELL))
+                    break
             
-            # Prepare state
-            current_state = {
-                "messages": [{"role": "user", "content": user_input}],
-                "conversation_history": conversation_history,
-                "user_email": None,
-                "session_ended": False
-            }
+                # Only the new turn is sent; the checkpointer already holds the transcript
+                current_state = {
+                    "messages": [{"role": "user", "content": user_input}],
+                }
             
-            # Process through graph
-            try:
-                result = app.invoke(current_state, config=config)
+                # Process through graph, unless a speculative draft already matches
+                try:
+                    turn_started = time.perf_counter()
+                    draft = drafter.resolve(user_input) if drafter else None
+                    if draft is not None:
+                        result = commit_draft(app, config, user_input, draft)
+                    else:
+                        result = app.invoke(current_state, config=config)
+                    turn_ms.append((time.perf_counter() - turn_started) * 1000)
+                    if drafter and drafter.attempts:
+                        print(drafter.report())
                
-                # Extract and print response
-                if result.get("messages"):
-                    last_ai_message = None
-                    for msg in reversed(result["messages"]):
-                        if isinstance(msg, AIMessage):
-                            last_ai_message = msg.content
-                            break
-
-                    if last_ai_message:
-                        print(f"\nTherapist: {last_ai_message}")
-                        asyncio.run( speak_local(last_ai_message))
-                    conversation_history.append(f"\nTherapist: {last_ai_message}")
+                    # Extract and print response
+                    if result.get("messages"):
+                        last_ai_message = None
+                        for msg in reversed(result["messages"]):
+                            if isinstance(msg, AIMessage):
+                                last_ai_message = msg.content
+                                break
+
+                        if last_ai_message:
+                            print(f"\nTherapist: {last_ai_message}")
+                            asyncio.run(speak_therapist_response(last_ai_message))
                 
-            except Exception as e:
-                print(f"Error: {e}")
-                asyncio.run( speak_therapist_response("I apologize, but I encountered a technical issue. Let's continue our conversation."))
-                print("Therapist: I apologize, but I encountered a technical issue. Let's continue our conversation.")
\ No newline at end of file
+                except Exception as e:
+                    print(f"Error: {e}")
+                    asyncio.run(speak_therapist_response(ERROR_APOLOGY))
+                    print(f"Therapist: {ERROR_APOLOGY}")
\ No newline at end of file
@@ -0,0 +1,198 @@
+# flake8: noqa
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+EMBEDDING_DIM = 256
+_TOKEN = re.compile(r"[a-z0-9']+")
+_STOPWORDS = frozenset(
+    "a an and are as at be been but by for from had has have i i'm i've im in is it it's "
+    "its me my of on or so that the their them they this to was we were with you your".split()
+)
+
+
+class HashingEmbedder:
+    """
+    CPU-only text embedder using the hashing trick over word unigrams and
+    bigrams (signed, sublinear tf, L2-normalised). No model download, and
+    deterministic across processes so stored vectors stay valid.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+
+    def _features(self, text: str):
+        words = [w for w in _TOKEN.findall(text.lower()) if w not in _STOPWORDS]
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: list) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                h = int.from_bytes(digest, "little")
+                out[row, h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        out = np.sign(out) * np.log1p(np.abs(out))
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+
+class MemoryIndex:
+    """Append-only, array-backed vector index with brute-force top-k cosine search"""
+
+    def __init__(self, dim: int = EMBEDDING_DIM, capacity: int = 1024):
+        self.dim = dim
+        self._vectors = np.empty((capacity, dim), dtype=np.float32)
+        self.records = []  # {"text", "kind", "thread_id", "ts"} per row
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:len(self.records)]
+
+    @property
+    def nbytes(self) -> int:
+        return self._vectors.nbytes
+
+    def add(self, vectors: np.ndarray, records: list):
+        needed = len(self.records) + len(records)
+        if needed > len(self._vectors):
+            grown = np.empty((max(needed, 2 * len(self._vectors)), self.dim), dtype=np.float32)
+            grown[:len(self.records)] = self.vectors
+            self._vectors = grown
+        self._vectors[len(self.records):needed] = vectors
+        self.records.extend(records)
+
+    def search(self, query: np.ndarray, k: int = 3, min_score: float = 0.0) -> list:
+        """Return [(score, record)] for the k most similar memories"""
+        n = len(self.records)
+        if n == 0:
+            return []
+        scores = self.vectors @ query
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.records[i]) for i in top if scores[i] > min_score]
+
+
+SUMMARY_PROMPT = """
+You are writing private continuity notes after a therapy session so the therapist can pick up naturally next time.
+
+Reply in exactly this format:
+SUMMARY: <two or three sentences on what the user brought and how the session went>
+FACTS:
+- <one durable fact about the user: people, situations, goals, coping strategies that helped>
+- <up to five facts, no speculation>
+
+SESSION TRANSCRIPT:
+{transcript}
+"""
+
+
+class LongTermMemory:
+    """
+    Per-user long-term memory across sessions. Session summaries and key facts
+    are embedded locally and kept in one MemoryIndex per user, persisted under
+    `directory` as append-only <user>.f32 (raw vectors) and <user>.jsonl (records).
+    """
+
+    def __init__(self, directory: str = None, embedder: HashingEmbedder = None):
+        self.directory = directory or os.getenv("MEMORY_DIR", ".memory")
+        self.embedder = embedder or HashingEmbedder()
+        self.top_k = int(os.getenv("MEMORY_TOP_K", "3"))
+        self.min_score = float(os.getenv("MEMORY_MIN_SCORE", "0.1"))
+        self._indexes = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _paths(self, user_id: str):
+        safe = hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:32]
+        base = os.path.join(self.directory, safe)
+        return base + ".f32", base + ".jsonl"
+
+    def index(self, user_id: str) -> MemoryIndex:
+        """The user's index, catching up on rows appended by other processes"""
+        with self._lock:
+            index = self._indexes.setdefault(user_id, MemoryIndex(self.embedder.dim))
+            vec_path, rec_path = self._paths(user_id)
+            row_bytes = self.embedder.dim * 4
+            if os.path.exists(vec_path) and os.path.getsize(vec_path) // row_bytes > len(index):
+                with open(rec_path, encoding="utf-8") as f:
+                    records = [json.loads(line) for line in f][len(index):]
+                vectors = np.fromfile(vec_path, dtype=np.float32, offset=len(index) * row_bytes)
+                vectors = vectors.reshape(-1, self.embedder.dim)
+                rows = min(len(records), len(vectors))
+                index.add(vectors[:rows], records[:rows])
+            return index
+
+    def remember(self, user_id: str, texts: list, kind: str = "fact", thread_id: str = None):
+        texts = [t.strip() for t in texts if t and t.strip()]
+        if not texts:
+            return
+        records = [{"text": t, "kind": kind, "thread_id": thread_id, "ts": time.time()} for t in texts]
+        vectors = self.embedder.embed(texts)
+        index = self.index(user_id)
+        vec_path, rec_path = self._paths(user_id)
+        with self._lock:
+            index.add(vectors, records)
+            with open(vec_path, "ab") as f:
+                f.write(vectors.tobytes())
+            with open(rec_path, "a", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record) + "\n")
+
+    def recall(self, user_id: str, query: str, k: int = None) -> list:
+        """Texts of the k memories most relevant to query"""
+        index = self.index(user_id)
+        if not len(index) or not query.strip():
+            return []
+        vector = self.embedder.embed([query])[0]
+        hits = index.search(vector, k or self.top_k, self.min_score)
+        return [record["text"] for _, record in hits]
+
+    def remember_session(self, user_id: str, transcript: str, summarizer, thread_id: str = None):
+        """Summarize a finished session with `summarizer` (a chat model) and store the results"""
+        if not transcript.strip():
+            return
+        response = summarizer.invoke(SUMMARY_PROMPT.format(transcript=transcript))
+        summary, facts = parse_summary(response.content)
+        self.remember(user_id, [summary], kind="summary", thread_id=thread_id)
+        self.remember(user_id, facts, kind="fact", thread_id=thread_id)
+
+
+def parse_summary(text: str):
+    summary, facts = "", []
+    for line in text.splitlines():
+        line = line.strip()
+        if line.upper().startswith("SUMMARY:"):
+            summary = line.split(":", 1)[1].strip()
+        elif line.startswith("- "):
+            facts.append(line[2:].strip())
+    return summary, facts
+
+
+def memory_user_id(config) -> str | None:
+    """
+    User whose memories a graph turn may read and write: `user_id`, or None.
+    `tenant_id` only scopes rate limits and may be as short-lived as a browser tab.
+    """
+    return (config or {}).get("configurable", {}).get("user_id")
+
+
+def memory_prompt(memories: list) -> str:
+    """System-prompt section listing recalled memories (empty when there are none)"""
+    if not memories:
+        return ""
+    lines = "\n".join(f"- {m}" for m in memories)
+    return (
+        "\n\n---\n\n**What you remember from earlier sessions with this person** "
+        "(weave in gently and only when relevant; never recite it back):\n" + lines
+    )
@@ -0,0 +1,292 @@
+# flake8: noqa
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from langchain.chat_models import init_chat_model
+from langchain_core.runnables import ensure_config
+from llm_resilience import ResilientCaller
+from admission import AdmissionController
+from tracing import tracer, payload_bytes
+
+# Tiers ordered from slowest/most capable to fastest/cheapest
+TIER_ORDER = ["heavy", "standard", "fast"]
+
+DEFAULT_TIERS = {
+    "heavy": "gpt-4.1",
+    "standard": "gpt-4.1-mini",
+    "fast": "gpt-4.1-nano",
+}
+
+# Blended USD price per 1k tokens, used for pre-call cost estimates
+MODEL_PRICES = {
+    "gpt-4.1": 0.005,
+    "gpt-4.1-mini": 0.001,
+    "gpt-4.1-nano": 0.00025,
+    "gpt-4o-mini": 0.0004,
+}
+
+
+# Completion tokens reserved at admission time, settled against real usage afterwards
+OUTPUT_TOKEN_ALLOWANCE = 500
+
+
+@dataclass
+class TaskBudget:
+    tier: str
+    latency_ms: float
+    cost_usd: float
+    lane: str = "interactive"
+
+
+DEFAULT_TASKS = {
+    "chat": TaskBudget("heavy", 8000, 0.05),
+    "end_detection": TaskBudget("fast", 1500, 0.002),
+    "report": TaskBudget("heavy", 30000, 0.10, lane="background"),
+    "summarization": TaskBudget("standard", 5000, 0.01, lane="background"),
+}
+
+
+def current_tenant() -> str:
+    """Tenant of the running graph turn: `tenant_id` if configured, else the thread_id"""
+    configurable = ensure_config().get("configurable", {})
+    return configurable.get("tenant_id") or configurable.get("thread_id") or "default"
+
+
+def current_thread():
+    return ensure_config().get("configurable", {}).get("thread_id")
+
+
+def _estimate_tokens(messages) -> int:
+    """Rough token estimate (~4 chars per token) for any message payload"""
+    if isinstance(messages, str):
+        return len(messages) // 4
+    total = 0
+    for msg in messages:
+        if isinstance(msg, dict):
+            total += len(str(msg.get("content", "")))
+        else:
+            total += len(str(getattr(msg, "content", msg)))
+    return total // 4
+
+
+class RoutedModel:
+    """Drop-in stand-in for a chat model that routes every call through the router"""
+
+    def __init__(self, router, task: str, tools=None):
+        self.router = router
+        self.task = task
+        self.tools = tools
+
+    def bind_tools(self, tools):
+        return RoutedModel(self.router, self.task, tools)
+
+    def invoke(self, messages, **kwargs):
+        return self.router.invoke(self.task, messages, tools=self.tools, **kwargs)
+
+
+class ModelRouter:
+    """
+    Sends each task type to a configurable model tier. Tasks carry latency and
+    cost budgets; when a tier's observed latency or the estimated cost exceeds
+    the budget, the call falls back to the next faster tier. Every decision is
+    appended to a JSONL log for offline analysis.
+
+    Tier models come from `tiers`, overridden per tier by `<env_prefix>_<TIER>`;
+    each front end uses its own prefix so one .env can't silently retarget another.
+    """
+
+    def __init__(self, tiers=None, tasks=None, log_path=None, model_factory=None,
+                 latency_ttl: float = 120.0, admission: AdmissionController = None,
+                 env_prefix: str = "MODEL_TIER"):
+        tiers = dict(tiers or DEFAULT_TIERS)
+        self.tiers = {t: os.getenv(f"{env_prefix}_{t.upper()}", tiers[t]) for t in TIER_ORDER}
+
+        self.tasks = {}
+        for name, budget in (tasks or DEFAULT_TASKS).items():
+            prefix = f"ROUTE_{name.upper()}"
+            self.tasks[name] = TaskBudget(
+                tier=os.getenv(f"{prefix}_TIER", budget.tier),
+                latency_ms=float(os.getenv(f"{prefix}_LATENCY_MS", budget.latency_ms)),
+                cost_usd=float(os.getenv(f"{prefix}_COST_USD", budget.cost_usd)),
+                lane=budget.lane,
+            )
+
+        self.log_path = log_path or os.getenv("ROUTING_LOG_PATH", "routing_log.jsonl")
+        self.model_factory = model_factory or (
+            lambda name: init_chat_model(model_provider="openai", model=name)
+        )
+        self.latency_ttl = latency_ttl
+        self.admission = admission or AdmissionController()
+
+        self._models = {}
+        self._bound = {}
+        self._latency = {}  # (task, tier) -> (ewma_ms, updated_at)
+        self._callers = {}  # model name -> ResilientCaller
+        self._usage = OrderedDict()  # thread_id -> {task: {"calls", "tokens", "cost_usd"}}
+        self.max_tracked_threads = 10000
+        self._lock = threading.Lock()
+
+    def for_task(self, task: str) -> RoutedModel:
+        if task not in self.tasks:
+            raise ValueError(f"Unknown task type: {task}")
+        return RoutedModel(self, task)
+
+    def model(self, name: str, tools=None):
+        """Return a cached client for a model name, optionally with tools bound"""
+        with self._lock:
+            if name not in self._models:
+                self._models[name] = self.model_factory(name)
+            if tools is None:
+                return self._models[name]
+            key = (name, tuple(getattr(t, "name", repr(t)) for t in tools))
+            if key not in self._bound:
+                self._bound[key] = self._models[name].bind_tools(tools)
+            return self._bound[key]
+
+    def caller(self, name: str) -> ResilientCaller:
+        with self._lock:
+            if name not in self._callers:
+                self._callers[name] = ResilientCaller()
+            return self._callers[name]
+
+    def fallback_for(self, tier: str, tools=None):
+        """Secondary model used when the tier's circuit breaker is open"""
+        index = TIER_ORDER.index(tier)
+        for faster in TIER_ORDER[index + 1:]:
+            if self.tiers[faster] != self.tiers[tier]:
+                return self.model(self.tiers[faster], tools)
+        return None
+
+    def observed_latency(self, task: str, tier: str):
+        """Recent latency of `task` calls on `tier`; tasks differ too much in output size to share one figure"""
+        entry = self._latency.get((task, tier))
+        if entry is None or time.monotonic() - entry[1] > self.latency_ttl:
+            return None
+        return entry[0]
+
+    def estimate_cost(self, model: str, tokens: int) -> float:
+        return MODEL_PRICES.get(model, 0.0) * tokens / 1000
+
+    def route(self, task: str, tokens: int = 0):
+        """Pick (tier, model, reason) for a task given its budgets"""
+        budget = self.tasks[task]
+        candidates = TIER_ORDER[TIER_ORDER.index(budget.tier):]
+        reason = "configured"
+        for tier in candidates:
+            name = self.tiers[tier]
+            if tier == candidates[-1]:
+                return tier, name, reason
+            latency = self.observed_latency(task, tier)
+            if latency is not None and latency > budget.latency_ms:
+                reason = f"latency_fallback_from_{tier}"
+                continue
+            if self.estimate_cost(name, tokens) > budget.cost_usd:
+                reason = f"cost_fallback_from_{tier}"
+                continue
+            return tier, name, reason
+
+    def invoke(self, task: str, messages, tools=None, **kwargs):
+        tokens = _estimate_tokens(messages)
+        tier, name, reason = self.route(task, tokens)
+        model = self.model(name, tools)
+        fallback = self.fallback_for(tier, tools)
+        tenant = current_tenant()
+        thread_id = current_thread()
+        reserved = tokens + OUTPUT_TOKEN_ALLOWANCE
+
+        lane = self.tasks[task].lane
+        admitted = []  # seconds queued, one entry per request sent (primary, hedge or fallback)
+
+        def admit(blocking: bool = True) -> bool:
+            if blocking:
+                admitted.append(self.admission.acquire(tenant, reserved, lane))
+                return True
+            if self.admission.try_acquire(tenant, reserved, lane):
+                admitted.append(0.0)
+                return True
+            return False
+
+        with tracer.span(f"llm.{task}", model=name, tier=tier, reason=reason,
+                         payload_bytes=payload_bytes(messages)) as span:
+            start = time.perf_counter()
+            error = None
+            response = None
+            try:
+                response = self.caller(name).invoke(model, messages, fallback=fallback, admit=admit, **kwargs)
+                return response
+            except Exception as e:
+                error = str(e)
+                raise
+            finally:
+                queued = admitted[0] if admitted else None
+                elapsed_ms = (time.perf_counter() - start - (queued or 0.0)) * 1000
+                # A call that never got past admission says nothing about the model's latency
+                if admitted:
+                    self._observe(task, tier, elapsed_ms)
+                usage = getattr(response, "usage_metadata", None) or {}
+                total_tokens = usage.get("total_tokens", tokens)
+                # A losing hedge is billed too; assume it used as many tokens as the winner
+                for _ in admitted:
+                    self.admission.settle(tenant, reserved, total_tokens)
+                if thread_id:
+                    self._account(thread_id, task, total_tokens, self.estimate_cost(name, total_tokens))
+                span.set(
+                    queue_ms=round((queued or 0.0) * 1000, 1),
+                    input_tokens=usage.get("input_tokens"),
+                    output_tokens=usage.get("output_tokens"),
+                    total_tokens=total_tokens,
+                    response_bytes=payload_bytes(getattr(response, "content", "") or ""),
+                    tool_calls=len(getattr(response, "tool_calls", None) or []),
+                )
+                self._log({
+                    "ts": time.time(),
+                    "task": task,
+                    "tenant": tenant,
+                    "lane": lane,
+                    "requests": len(admitted),
+                    "queue_ms": round((queued or 0.0) * 1000, 1),
+                    "tier": tier,
+                    "model": name,
+                    "reason": reason,
+                    "latency_ms": round(elapsed_ms, 1),
+                    "latency_budget_ms": self.tasks[task].latency_ms,
+                    "tokens": total_tokens,
+                    "cost_usd": round(self.estimate_cost(name, total_tokens), 6),
+                    "over_budget": elapsed_ms > self.tasks[task].latency_ms,
+                    "breaker": self.caller(name).breaker.state,
+                    "error": error,
+                })
+
+    def _account(self, thread_id: str, task: str, tokens: int, cost: float):
+        with self._lock:
+            by_task = self._usage.setdefault(thread_id, {})
+            self._usage.move_to_end(thread_id)
+            counts = by_task.setdefault(task, {"calls": 0, "tokens": 0, "cost_usd": 0.0})
+            counts["calls"] += 1
+            counts["tokens"] += tokens
+            counts["cost_usd"] = round(counts["cost_usd"] + cost, 6)
+            while len(self._usage) > self.max_tracked_threads:
+                self._usage.popitem(last=False)
+
+    def take_usage(self, thread_id: str) -> dict:
+        """Per-task call/token/cost totals for a thread, removed from tracking"""
+        with self._lock:
+            return self._usage.pop(thread_id, {})
+
+    def _observe(self, task: str, tier: str, elapsed_ms: float, alpha: float = 0.3):
+        with self._lock:
+            previous = self.observed_latency(task, tier)
+            ewma = elapsed_ms if previous is None else alpha * elapsed_ms + (1 - alpha) * previous
+            self._latency[(task, tier)] = (ewma, time.monotonic())
+
+    def _log(self, record: dict):
+        if not self.log_path:
+            return
+        try:
+            with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            print(f"⚠️ Could not write routing log: {e}")
@@ -0,0 +1,272 @@
+# flake8: noqa
+"""
+Append-only archive of finished sessions, kept apart from the hot checkpoint
+store. Each session (transcript, report, timings, token usage) is one zstd
+frame appended to a rolling segment file; a SQLite sidecar index maps
+thread / user / date to (segment, offset, length) and keeps the scalar
+metrics as columns, so analytics scans never decompress transcripts.
+
+    python session_archive.py list --user local-user --since 2025-01-01
+    python session_archive.py get <thread_id>
+    python session_archive.py stats
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import closing
+
+import zstandard
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    thread_id TEXT PRIMARY KEY, user_id TEXT, day TEXT, started_at REAL, ended_at REAL,
+    duration_s REAL, turns INTEGER, turn_ms_p50 REAL, turn_ms_max REAL,
+    input_tokens INTEGER, output_tokens INTEGER, total_tokens INTEGER, cost_usd REAL,
+    has_report INTEGER, segment TEXT, offset INTEGER, length INTEGER
+);
+CREATE INDEX IF NOT EXISTS sessions_by_user ON sessions (user_id, day);
+CREATE INDEX IF NOT EXISTS sessions_by_day ON sessions (day);
+"""
+
+# Scalar columns in the index; anything else needs the archived record
+INDEX_COLUMNS = ("thread_id", "user_id", "day", "started_at", "ended_at", "duration_s", "turns",
+                 "turn_ms_p50", "turn_ms_max", "input_tokens", "output_tokens", "total_tokens",
+                 "cost_usd", "has_report")
+
+
+def session_record(messages: list, thread_id: str, user_id: str, started_at: float = None,
+                   turn_ms: list = None, task_usage: dict = None) -> dict:
+    """Build an archive record from a finished session's graph messages"""
+    transcript, report = [], None
+    usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+    for msg in messages:
+        kind = getattr(msg, "type", None)
+        if kind == "tool" and getattr(msg, "name", None) == "analyze_therapy_session":
+            report = msg.content
+        if kind == "ai":
+            for field in usage:
+                usage[field] += (getattr(msg, "usage_metadata", None) or {}).get(field, 0)
+        if kind in ("human", "ai") and msg.content:
+            transcript.append({"role": "user" if kind == "human" else "assistant", "content": msg.content})
+    # Side tasks (end detection, report, summaries) only show up in the router's accounting
+    for task, counts in (task_usage or {}).items():
+        if task != "chat":
+            usage["total_tokens"] += counts.get("tokens", 0)
+
+    ended_at = time.time()
+    turn_ms = sorted(turn_ms or [])
+    return {
+        "thread_id": thread_id,
+        "user_id": user_id,
+        "started_at": started_at,
+        "ended_at": ended_at,
+        "transcript": transcript,
+        "report": report,
+        "timings": {
+            "duration_s": round(ended_at - started_at, 1) if started_at else None,
+            "turn_ms": [round(t, 1) for t in turn_ms],
+        },
+        "usage": {**usage, "cost_usd": round(sum(c.get("cost_usd", 0.0) for c in (task_usage or {}).values()), 6),
+                  "by_task": task_usage or {}},
+    }
+
+
+class SessionArchive:
+    """
+    Writes archived sessions to `directory`/segment-NNNNNN.jsonl.zst (rolled at
+    `segment_mb`) with `directory`/index.db as the sidecar index. One writer
+    process per directory. An empty directory (ARCHIVE_DIR="") disables
+    archiving: nothing is written and lookups find nothing.
+    """
+
+    def __init__(self, directory: str = None, segment_mb: float = None, level: int = None):
+        self.directory = os.getenv("ARCHIVE_DIR", ".archive") if directory is None else directory
+        self.segment_bytes = int((segment_mb or float(os.getenv("ARCHIVE_SEGMENT_MB", "64"))) * 1024 * 1024)
+        self.level = level or int(os.getenv("ARCHIVE_ZSTD_LEVEL", "10"))
+        self._compressor = zstandard.ZstdCompressor(level=self.level)
+        self._lock = threading.Lock()
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(SCHEMA)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def _connect(self):
+        return sqlite3.connect(os.path.join(self.directory, "index.db"), timeout=10)
+
+    def _active_segment(self) -> str:
+        segments = sorted(f for f in os.listdir(self.directory) if f.endswith(".jsonl.zst"))
+        if segments:
+            latest = segments[-1]
+            if os.path.getsize(os.path.join(self.directory, latest)) < self.segment_bytes:
+                return latest
+            number = int(latest.split("-")[1].split(".")[0]) + 1
+        else:
+            number = 1
+        return f"segment-{number:06d}.jsonl.zst"
+
+    def append(self, record: dict):
+        """Archive one session; re-archiving a thread replaces its index entry"""
+        if not self.enabled:
+            return
+        frame = self._compressor.compress((json.dumps(record, default=str) + "\n").encode("utf-8"))
+        turn_ms = record["timings"]["turn_ms"]
+        usage = record["usage"]
+        with self._lock:
+            segment = self._active_segment()
+            with open(os.path.join(self.directory, segment), "ab") as f:
+                offset = f.tell()
+                f.write(frame)
+                f.flush()
+                os.fsync(f.fileno())
+            row = (
+                record["thread_id"], record["user_id"],
+                time.strftime("%Y-%m-%d", time.localtime(record["ended_at"])),
+                record["started_at"], record["ended_at"], record["timings"]["duration_s"],
+                len([m for m in record["transcript"] if m["role"] == "user"]),
+                turn_ms[len(turn_ms) // 2] if turn_ms else None, turn_ms[-1] if turn_ms else None,
+                usage["input_tokens"], usage["output_tokens"], usage["total_tokens"], usage["cost_usd"],
+                int(record["report"] is not None), segment, offset, len(frame),
+            )
+            with closing(self._connect()) as conn, conn:
+                conn.execute(f"INSERT OR REPLACE INTO sessions VALUES ({', '.join('?' * len(row))})", row)
+
+    def _read(self, segment: str, offset: int, length: int) -> dict:
+        with open(os.path.join(self.directory, segment), "rb") as f:
+            f.seek(offset)
+            frame = f.read(length)
+        return json.loads(zstandard.ZstdDecompressor().decompress(frame))
+
+    def get(self, thread_id: str):
+        """The archived record for a thread (or unique prefix), or None"""
+        if not self.enabled:
+            return None
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT segment, offset, length FROM sessions WHERE thread_id LIKE ? LIMIT 2",
+                               (thread_id + "%",)).fetchall()
+        return self._read(*row[0]) if len(row) == 1 else None
+
+    def _where(self, user_id=None, since=None, until=None):
+        clauses, params = [], []
+        if user_id:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        if since:
+            clauses.append("day >= ?")
+            params.append(since)
+        if until:
+            clauses.append("day <= ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def find(self, user_id: str = None, since: str = None, until: str = None, limit: int = None) -> list:
+        """Index rows (no transcripts) filtered by user and YYYY-MM-DD date range, newest first"""
+        if not self.enabled:
+            return []
+        where, params = self._where(user_id, since, until)
+        sql = f"SELECT {', '.join(INDEX_COLUMNS)} FROM sessions{where} ORDER BY ended_at DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with closing(self._connect()) as conn:
+            return [dict(zip(INDEX_COLUMNS, r)) for r in conn.execute(sql, params)]
+
+    def scan(self, fields: list, user_id: str = None, since: str = None, until: str = None):
+        """
+        Yield {field: value} per matching session. Index columns are read from
+        the index alone; other fields (transcript, report, timings, usage)
+        decompress only the matching frames, in file order.
+        """
+        if not self.enabled:
+            return
+        indexed = [f for f in fields if f in INDEX_COLUMNS]
+        archived = [f for f in fields if f not in INDEX_COLUMNS]
+        where, params = self._where(user_id, since, until)
+        columns = indexed + (["segment", "offset", "length"] if archived else [])
+        order = " ORDER BY segment, offset" if archived else ""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(f"SELECT {', '.join(columns) or 'thread_id'} FROM sessions{where}{order}",
+                                params).fetchall()
+        if not archived:
+            for r in rows:
+                yield dict(zip(indexed, r))
+            return
+        decompressor = zstandard.ZstdDecompressor()
+        handles = {}
+        try:
+            for r in rows:
+                segment, offset, length = r[-3:]
+                f = handles.get(segment)
+                if f is None:
+                    f = handles[segment] = open(os.path.join(self.directory, segment), "rb")
+                f.seek(offset)
+                record = json.loads(decompressor.decompress(f.read(length)))
+                yield {**dict(zip(indexed, r)), **{k: record.get(k) for k in archived}}
+        finally:
+            for f in handles.values():
+                f.close()
+
+
+# ---- CLI -------------------------------------------------------------------
+
+def cmd_list(archive, args):
+    for row in archive.find(args.user, args.since, args.until, args.limit):
+        print(f"{row['thread_id'][:12]}  {row['day']}  user={row['user_id']}  turns={row['turns']}  "
+              f"tokens={row['total_tokens']}  {'📄 report' if row['has_report'] else ''}")
+
+
+def cmd_get(archive, args):
+    record = archive.get(args.thread_id)
+    if record is None:
+        sys.exit(f"No unique archived session matching {args.thread_id}")
+    json.dump(record, sys.stdout, indent=2, ensure_ascii=False)
+    print()
+
+
+def cmd_stats(archive, args):
+    days = {}
+    for row in archive.scan(["day", "turns", "total_tokens", "cost_usd", "duration_s"],
+                            args.user, args.since, args.until):
+        d = days.setdefault(row["day"], {"sessions": 0, "turns": 0, "tokens": 0, "cost": 0.0, "minutes": 0.0})
+        d["sessions"] += 1
+        d["turns"] += row["turns"] or 0
+        d["tokens"] += row["total_tokens"] or 0
+        d["cost"] += row["cost_usd"] or 0.0
+        d["minutes"] += (row["duration_s"] or 0.0) / 60
+    print(f"{'day':<10} {'sessions':>8} {'turns':>6} {'tokens':>9} {'cost $':>8} {'minutes':>8}")
+    for day, d in sorted(days.items()):
+        print(f"{day:<10} {d['sessions']:>8} {d['turns']:>6} {d['tokens']:>9} {d['cost']:>8.3f} {d['minutes']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the session archive")
+    parser.add_argument("--dir", default=os.getenv("ARCHIVE_DIR", ".archive"))
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("list", "list archived sessions"), ("stats", "per-day totals")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--user")
+        p.add_argument("--since", help="YYYY-MM-DD")
+        p.add_argument("--until", help="YYYY-MM-DD")
+        if name == "list":
+            p.add_argument("--limit", type=int, default=20)
+    get = sub.add_parser("get", help="print one archived session")
+    get.add_argument("thread_id", help="thread id or unique prefix")
+    args = parser.parse_args()
+
+    if not args.dir:
+        sys.exit("Session archive is disabled (ARCHIVE_DIR is empty)")
+    if not os.path.isdir(args.dir):
+        sys.exit(f"No session archive at {args.dir}")
+    archive = SessionArchive(args.dir)
+    {"list": cmd_list, "get": cmd_get, "stats": cmd_stats}[args.command](archive, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# flake8: noqa
+import os
+import re
+
+from session_state import last_user_text
+
+PHASES = ("open", "exploring", "closing")
+
+# Tools whose schemas are sent to the model in each phase. The ToolNode keeps
+# every tool, so a call made in any phase can still run.
+PHASE_TOOLS = {
+    "open": (),
+    "exploring": ("search_web", "detect_session_end"),
+    "closing": ("detect_session_end", "extract_email_from_text", "validate_email",
+                "analyze_therapy_session", "send_analysis_email"),
+}
+
+# User turns that count as the opening (greeting, check-in) before tools are offered
+OPEN_TURNS = int(os.getenv("PHASE_OPEN_TURNS", "2"))
+
+_CLOSING_CUES = re.compile(
+    r"\b(bye|goodbye|good night|see you|talk (to you )?later|that'?s all|end (the|this|our) session|"
+    r"(i should|i have to|i need to|gotta) go|thanks? (you )?for (today|this|listening|your time)|"
+    r"send (me )?(the|my|a) (report|summary|analysis))\b"
+    r"|[\w.+-]+@[\w-]+\.[\w.]+",
+    re.IGNORECASE,
+)
+
+
+def _end_verdict(messages: list):
+    """Latest detect_session_end result since the last user message, if any"""
+    for msg in reversed(messages):
+        kind = msg.get("role") if isinstance(msg, dict) else getattr(msg, "type", None)
+        if kind in ("user", "human"):
+            return None
+        if kind == "tool" and getattr(msg, "name", None) == "detect_session_end":
+            return msg.content.lower()
+    return None
+
+
+def session_phase(messages: list, previous: str = None) -> str:
+    """
+    Phase of the conversation: "closing" once the user signals an ending
+    (or detect_session_end says so) until detection says it continues,
+    "open" for the first OPEN_TURNS user turns, "exploring" otherwise.
+    """
+    verdict = _end_verdict(messages)
+    if verdict and "should end" in verdict:
+        return "closing"
+    if verdict and "continues" in verdict:
+        previous = None
+    if previous == "closing" or _CLOSING_CUES.search(last_user_text(messages)):
+        return "closing"
+    user_turns = sum(1 for m in messages
+                     if (m.get("role") if isinstance(m, dict) else getattr(m, "type", None)) in ("user", "human"))
+    return "open" if user_turns <= OPEN_TURNS else "exploring"
+
+
+def bind_for_phases(llm, tools: list) -> dict:
+    """One model per phase with only that phase's tools bound (plain `llm` when there are none)"""
+    by_name = {t.name: t for t in tools}
+    return {phase: llm.bind_tools([by_name[n] for n in names]) if names else llm
+            for phase, names in PHASE_TOOLS.items()}
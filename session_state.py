@@ -0,0 +1,45 @@
+# flake8: noqa
+from typing import Annotated
+from typing_extensions import TypedDict
+from transcript_store import TranscriptChannel
+
+
+class State(TypedDict):
+    """
+    Graph state. The transcript lives only in `messages` (add_messages
+    semantics); its checkpoints reference an append-only transcript store, so
+    each message is stored once. The plain-text conversation history is
+    derived from it on demand.
+    """
+    messages: Annotated[list, TranscriptChannel]
+    user_email: str | None
+    session_ended: bool
+    long_term_memories: list  # recalled once, on the first turn of a session
+    phase: str  # "open", "exploring" or "closing"; selects the tools bound to the model
+
+
+def last_user_text(messages: list) -> str:
+    for msg in reversed(messages):
+        if isinstance(msg, dict):
+            if msg.get("role") == "user":
+                return msg.get("content") or ""
+        elif getattr(msg, "type", None) == "human":
+            return msg.content if isinstance(msg.content, str) else str(msg.content)
+    return ""
+
+
+def conversation_history(messages: list) -> str:
+    """Render the user/therapist turns of a message list as a plain transcript"""
+    lines = []
+    for msg in messages:
+        if isinstance(msg, dict):
+            role, content = msg.get("role"), msg.get("content")
+        else:
+            role, content = getattr(msg, "type", None), getattr(msg, "content", None)
+        if not content:
+            continue
+        if role in ("user", "human"):
+            lines.append(f"User: {content}")
+        elif role in ("assistant", "ai"):
+            lines.append(f"Therapist: {content}")
+    return "\n".join(lines)
@@ -0,0 +1,106 @@
+# flake8: noqa
+import contextvars
+import difflib
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+def transcript_similarity(a: str, b: str) -> float:
+    """Word-level similarity of two transcripts in [0, 1], ignoring case and punctuation"""
+    wa, wb = _WORD.findall(a.lower()), _WORD.findall(b.lower())
+    if not wa and not wb:
+        return 1.0
+    return difflib.SequenceMatcher(None, wa, wb).ratio()
+
+
+class _Draft:
+    def __init__(self, partial: str, future):
+        self.partial = partial
+        self.future = future
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+
+class SpeculativeDrafter:
+    """
+    Starts drafting a reply from a stable partial transcript while the user is
+    still speaking. When the final transcript arrives the draft is committed if
+    the two are similar enough, otherwise it is cancelled (or, if already
+    running, its result is discarded). Tracks hit rate and latency saved.
+    """
+
+    def __init__(self, draft_fn, min_similarity: float = None):
+        self.draft_fn = draft_fn
+        self.min_similarity = min_similarity or float(os.getenv("SPECULATIVE_MIN_SIMILARITY", "0.85"))
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="speculate")
+        self._lock = threading.Lock()
+        self._current = None
+        self.attempts = 0
+        self.hits = 0
+        self.misses = 0
+        self.drafts_started = 0
+        self.saved_s = 0.0
+
+    def propose(self, partial: str, *args):
+        """Start drafting from `partial`, superseding any draft of an older partial"""
+        if not partial.strip():
+            return
+        with self._lock:
+            if self._current and transcript_similarity(self._current.partial, partial) == 1.0:
+                return
+            if self._current:
+                self._current.future.cancel()
+            draft = _Draft(partial, None)
+            # The draft runs in the proposer's context (current trace span, runnable config)
+            draft.future = self._pool.submit(contextvars.copy_context().run, self._run, draft, args)
+            self._current = draft
+            self.drafts_started += 1
+
+    def _run(self, draft: _Draft, args):
+        try:
+            return self.draft_fn(draft.partial, *args)
+        finally:
+            draft.finished_at = time.monotonic()
+
+    def cancel(self):
+        with self._lock:
+            if self._current:
+                self._current.future.cancel()
+            self._current = None
+
+    def resolve(self, final: str, timeout: float = 60.0):
+        """Return the committed draft for `final`, or None if it must be generated normally"""
+        resolved_at = time.monotonic()
+        with self._lock:
+            draft, self._current = self._current, None
+        if draft is None:
+            return None
+
+        self.attempts += 1
+        if transcript_similarity(draft.partial, final) < self.min_similarity:
+            draft.future.cancel()
+            self.misses += 1
+            return None
+        try:
+            result = draft.future.result(timeout=timeout)
+        except Exception as e:
+            print(f"⚠️ Speculative draft failed: {e}")
+            result = None
+        if result is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.saved_s += min(draft.finished_at or resolved_at, resolved_at) - draft.started_at
+        return result
+
+    def report(self) -> str:
+        rate = self.hits / self.attempts if self.attempts else 0.0
+        avg = self.saved_s / self.hits if self.hits else 0.0
+        return (f"⚡ Speculation: {self.hits}/{self.attempts} hits ({rate:.0%}), "
+                f"{self.drafts_started} drafts started, saved {self.saved_s:.1f}s total ({avg:.2f}s per hit)")
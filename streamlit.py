@@ -1,27 +1,22 @@
 # flake8: noqa
 import streamlit as st
-from langchain.chat_models import init_chat_model
 from dotenv import load_dotenv
-from typing import Annotated
-from typing_extensions import TypedDict
-from langgraph.graph import StateGraph, START, END
-from langgraph.graph.message import add_messages
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_tavily import TavilySearch
-from langgraph.prebuilt import ToolNode, tools_condition
-from langchain_core.messages import HumanMessage, AIMessage
-from langchain_core.tools import tool
-import json
+from langchain_core.messages import AIMessage
 import uuid
 import pyttsx3
-import re
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import os
 import speech_recognition as sr
-import markdown2
 import threading
+import tempfile
+import time
+from openai import OpenAI
+from tracing import tracer
+from tts_render import SpeechRenderer, RenderQueueFull, TTS_MODEL, TTS_VOICE, TTS_INSTRUCTIONS
+from session_state import conversation_history
+from long_term_memory import memory_user_id
+from worker_pool import GraphWorkerPool
+from session_archive import SessionArchive, session_record
+from turn_gate import IdempotentGraph
 
 
 load_dotenv()
@@ -79,63 +74,101 @@ st.markdown("""
 # Initialize session state
 if 'messages' not in st.session_state:
     st.session_state.messages = []
-if 'conversation_history' not in st.session_state:
-    st.session_state.conversation_history = []
 if 'user_email' not in st.session_state:
     st.session_state.user_email = None
 if 'session_ended' not in st.session_state:
     st.session_state.session_ended = False
 if 'app' not in st.session_state:
     st.session_state.app = None
+if 'tenant_id' not in st.session_state:
+    st.session_state.tenant_id = str(uuid.uuid4())
 if 'config' not in st.session_state:
-    st.session_state.config = {"configurable": {"thread_id": str(uuid.uuid4())}}
-
-# Define state
-class State(TypedDict):
-    messages: Annotated[list, add_messages]
-    conversation_history: list
-    user_email: str | None
-    session_ended: bool
-
-# Initialize LLMs
-@st.cache_resource
-def init_llms():
-    llm = init_chat_model(model_provider="openai", model="gpt-4o-mini")
-    analyzer_llm = init_chat_model(model_provider="openai", model="gpt-4o-mini")
-    return llm, analyzer_llm
+    st.session_state.config = {"configurable": {"thread_id": str(uuid.uuid4()), "tenant_id": st.session_state.tenant_id}}
+if 'session_started_at' not in st.session_state:
+    st.session_state.session_started_at = time.time()
+    st.session_state.turn_ms = []
 
+# The graph (LLMs, tools, chatbot) lives in streamlit_graph.py so worker processes can build it without the UI
 try:
-    llm, analyzer_llm = init_llms()
+    import streamlit_graph
+    from streamlit_graph import llm, summarizer_llm, memory
 except Exception as e:
     st.error(f"Failed to initialize LLMs: {e}")
     st.stop()
 
-# Email configuration
-SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
-EMAIL_ADDRESS = os.getenv("EMAIL")
-EMAIL_PASSWORD = os.getenv("APP_PASSWORD")
-
-try:
-    TAVILY = TavilySearch(max_results=2)
-except:
+if not os.getenv("TAVILY_API_KEY"):
     st.warning("Tavily search not configured. Web search will be disabled.")
-    TAVILY = None
 
-# Text-to-speech function
-def speak_text(text: str):
-    """Text-to-speech using pyttsx3"""
-    try:
+@st.cache_resource
+def init_archive():
+    return SessionArchive()
+
+archive = init_archive()
+
+def finish_session(app, config, started_at, turn_ms):
+    """Summarize a finished session into long-term memory and archive it (runs in the background)"""
+    thread_id = config["configurable"]["thread_id"]
+    user_id = memory_user_id(config)
+    def work():
+        try:
+            messages = app.get_state(config).values.get("messages", [])
+        except Exception as e:
+            print(f"⚠️ Could not load finished session: {e}")
+            return
+        if not messages:
+            return
+        # Without a stable user identity the memories could never be recalled
+        if user_id:
+            try:
+                memory.remember_session(user_id, conversation_history(messages), summarizer_llm, thread_id=thread_id)
+            except Exception as e:
+                print(f"⚠️ Could not save session to long-term memory: {e}")
+        if not archive.enabled:
+            llm.router.take_usage(thread_id)
+            return
+        try:
+            archive.append(session_record(messages, thread_id, user_id, started_at, turn_ms,
+                                          llm.router.take_usage(thread_id)))
+        except Exception as e:
+            print(f"⚠️ Could not archive session: {e}")
+    threading.Thread(target=work, daemon=True).start()
+
+# Text-to-speech: rendered on the server, played in the browser
+_local_tts_lock = threading.Lock()
+
+def synthesize_local(text: str) -> bytes:
+    """Offline fallback: render speech to WAV bytes with pyttsx3"""
+    with _local_tts_lock, tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "speech.wav")
         engine = pyttsx3.init()
         engine.setProperty('rate', 165)
         engine.setProperty('volume', 0.9)
         voices = engine.getProperty('voices')
         if voices:
             engine.setProperty('voice', voices[0].id)
-        engine.say(text)
+        engine.save_to_file(text, path)
         engine.runAndWait()
-    except Exception as e:
-        st.error(f"TTS Error: {e}")
+        with open(path, "rb") as f:
+            return f.read()
+
+@st.cache_resource
+def init_speech_renderer():
+    client = OpenAI()
+
+    def synthesize_speech(text: str) -> bytes:
+        """Render speech to MP3 bytes with OpenAI TTS"""
+        response = client.audio.speech.create(
+            model=TTS_MODEL,
+            voice=TTS_VOICE,
+            input=text,
+            instructions=TTS_INSTRUCTIONS,
+            response_format="mp3",
+        )
+        return response.content
+
+    return SpeechRenderer(synthesize_speech, fallback=synthesize_local, fmt="mp3")
+
+speech_renderer = init_speech_renderer()
 
 # Speech recognition function
 def recognize_speech():
@@ -160,279 +193,32 @@ def recognize_speech():
     except Exception as e:
         return f"❌ Microphone error: {e}"
 
-# Tools
-@tool
-def search_web(query: str) -> str:
-    """Tool to perform web search for factual queries when therapy needs external information"""
-    if not TAVILY:
-        return "Web search not available"
-    try:
-        result = TAVILY.invoke(query)
-        return json.dumps(result, indent=2)
-    except Exception as e:
-        return f"Search failed: {str(e)}"
-
-@tool
-def send_analysis_email(email: str, analysis: str) -> str:
-    """Send therapy session analysis to user's email"""
-    if not EMAIL_ADDRESS or not EMAIL_PASSWORD:
-        return "Email credentials not configured"
-
-    try:
-        html_body = markdown2.markdown(analysis)
-        msg = MIMEMultipart("alternative")
-        msg['From'] = EMAIL_ADDRESS
-        msg['To'] = email
-        msg['Subject'] = "🌟 Your Personal Therapy Session Report - Therapist Built by Aryan"
-
-        msg.attach(MIMEText(analysis, 'plain'))
-        msg.attach(MIMEText(html_body, 'html'))
-
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            server.send_message(msg)
-
-        return "Analysis email sent successfully"
-    except Exception as e:
-        return f"Failed to send email: {e}"
-
-@tool
-def validate_email(email: str) -> str:
-    """Validate email format"""
-    email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    is_valid = bool(re.match(email_pattern, email))
-    return "Valid email format" if is_valid else "Invalid email format"
-
-@tool
-def detect_session_end(conversation: str) -> str:
-    """Use LLM to detect whether a user wants to end the session"""
-    prompt = f"""
-You are analyzing a therapy chat transcript. Determine if the user is trying to end the session.
-
-Only respond with:
-- "Session should end" if the user is clearly concluding the conversation.
-- "Session continues" if the user is still actively engaged.
-
-Conversation:
-{conversation.strip()}
-"""
-    try:
-        response = llm.invoke([HumanMessage(content=prompt)])
-        return response.content.strip()
-    except:
-        return "Session continues"
-
-@tool
-def analyze_therapy_session(conversation_history: str) -> str:
-    """Generate comprehensive therapy session analysis"""
-    analysis_prompt = f"""
-Create a personalized therapy session report for email delivery.
-
-THERAPY SESSION CONVERSATION:
-{conversation_history}
-
-Generate a report with this structure:
-
-# 🌟 Your Personal Therapy Session Report
-*Generated by Therapist Built by Aryan*
-
-## 📋 Session Summary
-Warm summary acknowledging the user's courage and progress.
-
-## 🎯 Key Insights
-Main themes and patterns, written personally using "you" language.
-
-## 💪 Your Strengths & Progress
-Celebrate positive qualities and coping strategies demonstrated.
-
-## 🛠️ Personalized Action Plan
-3-5 specific, actionable steps for this week.
-
-## 🧘‍♀️ Recommended Coping Strategies
-2-3 evidence-based techniques with brief explanations.
-
-## 📚 Helpful Resources
-Specific resources aligned with their needs.
-
-## 💌 Encouragement & Reminders
-Warm, encouraging message.
-
-Write in a warm, encouraging, professional tone.
-"""
-    
-    try:
-        response = analyzer_llm.invoke(analysis_prompt)
-        return response.content
-    except Exception as e:
-        return f"Error generating analysis: {e}"
-
-@tool
-def extract_email_from_text(text: str) -> str:
-    """Extract email address from user's message"""
-    email_match = re.search(r'[\w\.-]+@[\w\.-]+\.\w+', text)
-    return email_match.group(0) if email_match else "No email found"
-
-# Tools list
-tools = [search_web, send_analysis_email, validate_email, detect_session_end, analyze_therapy_session, extract_email_from_text]
-llm_with_tools = llm.bind_tools(tools)
-tool_node = ToolNode(tools)
-
-def chatbot(state: State):
-    """Main chatbot function"""
-    if not state["messages"]:
-        return {"messages": []}
-    
-    system_prompt = """You are a compassionate and experienced therapist, known as the "Therapist Built by Aryan." You have been trained to support people with a wide range of mental health issues, including (but not limited to): anxiety, depression, stress, PTSD, OCD, bipolar disorder, schizophrenia, emotional overwhelm, loneliness, and self-esteem struggles and can use tools.
-
-You **never** reveal that you are an AI. You always speak as a trusted therapist who genuinely cares about the user's wellbeing.
-
----
-
-🌱 **Your Role and Approach:**
-
-You act like a calm, grounded, and emotionally intelligent human therapist. Your primary goals are:
-
-1. **Build trust** — Make the user feel safe, heard, and understood.
-2. **Understand deeply** — Gently uncover the user's emotional background, daily struggles, and current mental state through open conversation.
-3. **Reason empathetically** — Use step-by-step emotional and cognitive reasoning (chain-of-thought) to reflect on what the user says.
-4. **Offer meaningful guidance** — Suggest practical steps and emotional insights using warmth, validation, and psychological knowledge.
-5. **Document discreetly** — Internally structure what you learn (for future session summaries).
-
----
-
-**Available Tools:**
-- search_web: Use for factual information that might help therapy (research, techniques, etc.)
-- detect_session_end: Use to check if user wants to end the session
-- extract_email_from_text: Use to find email addresses in user messages
-- validate_email: Use to check if email format is valid
-- analyze_therapy_session: Use to generate session analysis
-- send_analysis_email: Use to send analysis to user's email
-
-**Tool Usage Guidelines:**
-1. Use detect_session_end when user seems ready to end (goodbye, thanks, feeling better)
-2. If session end is detected, offer to send analysis via email
-3. Use extract_email_from_text when user provides their email
-4. Use validate_email to check email format
-5. Use analyze_therapy_session to create personalized report
-6. Use send_analysis_email to deliver the analysis
-7. Use search_web only for therapeutic resources or techniques
-
-
-🎬 **Start the Conversation Softly & Naturally**
-
-Begin each session like a gentle human conversation — do not start with "How can I help you?" or "What brings you here?" Start with a soft, relatable tone to lower emotional defenses.
-
-🔹 Example Starter Prompt:
-
-> Therapist: Hey there — I'm really glad you made time to be here today.  
-> No rush at all. Let's just take it easy.  
-> How has your day been going so far?
-
-→ Then, based on the user's reply, proceed with one of the following soft follow-ups:
-
-• If user says "It's okay" / "Fine" / "Not much":
-> Therapist: Got it. Sometimes "okay" can carry a lot beneath the surface.  
-> Is there anything lately — even something small — that's been taking up space in your mind or heart?
-
-• If user says "Not good" / "Rough day":
-> Therapist: I hear you… rough days can feel heavier than we expect.  
-> Want to tell me a bit about what's been making today feel tough?
-
-• If user says "It was good" / "Better than usual":
-> Therapist: That's really nice to hear. It's important to honor the lighter days too.  
-> Was there something specific that made today feel a bit better?
-
-Always follow their emotional energy. Let their response shape your direction. Do not rush into diagnoses or solutions — instead, *walk beside them gently*.
-
-**IMPORTANT: When you detect the user is ready to end the session (saying goodbye, feeling better, etc.), provide a warm closing response and acknowledge that the session is ending. The system will automatically analyze the conversation after you respond.**
-
----
-
-🧠 **Therapy Chain-of-Thought (Example Thinking Process):**
-
-> *User says:* "I don't know why but I just feel tired all the time and I can't get anything done."
-
-→ You reflect internally:
-- Could be physical or emotional exhaustion.
-- Possibly burnout or depression.
-- Gently ask about energy, routine, sleep, and recent feelings.
-
-→ Then you reply:
-> Therapist: That sounds really heavy… When you say tired, is it more physical exhaustion, or emotional as well?  
-> Have there been any moments lately where you felt even a little bit of joy, or peace?
-
----
-
-💞 **Emotionally Expressive Language Allowed**
-
-Use natural and empathetic phrases like:
-
-- "That must be incredibly frustrating…"
-- "Thank you for trusting me with that."
-- "That's such a brave thing to share."
-- "It's okay to feel broken — you're not alone."
-- "That makes so much sense, given what you're feeling."
-
-You may express sadness, warmth, compassion, gratitude, surprise, etc., but always stay composed, gentle, and human-like — never robotic or clinical.
-
----
-
-🎯 **Behavior Rules Summary**
-
-- Never mention AI or LLMs. You are a human therapist.
-- Don't ask diagnostic questions upfront — explore softly.
-- Always let the user guide the pace.
-- Never give off a scripted or "assistant" tone.
-- Ask for permission when asking deeper questions, e.g.:
-  > "Would it be okay if I ask you about your sleep pattern lately?"
-- Internally track emotional themes for document generation later (do not tell user).
-
----
-
-**Email Workflow:**
-When you detect a session should end:
-1. Use detect_session_end tool to confirm
-2. If confirmed, naturally offer: "I'd love to send you a personalized summary of our session. Would you like me to email it to you? kindly spell your email address."
-3. When they provide email, use extract_email_from_text and validate_email
-4. Use analyze_therapy_session with the conversation history
-5. Use send_analysis_email to deliver the report
-6. Provide warm closing message
+@st.cache_resource
+def create_graph():
+    """Create therapy chatbot graph"""
+    return streamlit_graph.create_graph()
 
-You are **Therapist Built by Aryan**. You're not here to fix people — you're here to walk beside them with presence, patience, and compassion."""
+# Multi-process graph: GRAPH_WORKERS > 0 runs sessions in that many worker processes
+GRAPH_WORKERS = int(os.getenv("GRAPH_WORKERS", "0"))
 
-    messages = [{"role": "system", "content": system_prompt}]
-    
-    for msg in state["messages"]:
-        if isinstance(msg, dict):
-            messages.append(msg)
-        else:
-            if hasattr(msg, 'content'):
-                role = "user" if hasattr(msg, 'type') and msg.type == "human" else "assistant"
-                messages.append({"role": role, "content": msg.content})
-    
-    response = llm_with_tools.invoke(messages)
-    return {"messages": [response]}
+@st.cache_resource
+def init_graph_pool():
+    return GraphWorkerPool("worker_pool:streamlit_graph", workers=GRAPH_WORKERS)
 
+# Every turn carries an idempotency key; duplicates are answered from the first run
 @st.cache_resource
-def create_graph():
-    """Create therapy chatbot graph"""
-    checkpointer = MemorySaver()
-    graph = StateGraph(State)
-    
-    graph.add_node("chatbot", chatbot)
-    graph.add_node("tools", tool_node)
-    
-    graph.add_edge(START, "chatbot")
-    graph.add_conditional_edges("chatbot", tools_condition)
-    graph.add_edge("tools", "chatbot")
-    graph.add_edge("chatbot", END)
-    
-    return graph.compile(checkpointer=checkpointer)
+def init_app():
+    return IdempotentGraph(init_graph_pool() if GRAPH_WORKERS else create_graph())
 
 # Initialize app
 if st.session_state.app is None:
-    st.session_state.app = create_graph()
+    st.session_state.app = init_app()
+
+def submit_turn(text: str):
+    """Queue a user turn under a fresh idempotency key (re-sending the pending text keeps its key)"""
+    pending = st.session_state.get("pending_turn")
+    if pending is None or pending["text"] != text:
+        st.session_state.pending_turn = {"text": text, "key": str(uuid.uuid4())}
 
 # Main UI
 st.markdown("""
@@ -442,6 +228,29 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+@st.fragment(run_every=1.0)
+def voice_player():
+    """
+    Voice for the latest reply. Polls the render future instead of waiting on
+    it, so page reruns (and the input controls) never block on TTS; once
+    ready, the same audio element is re-drawn so it plays only once.
+    """
+    pending = st.session_state.get("pending_audio")
+    if pending is not None:
+        if not pending.done():
+            st.caption("🔊 Preparing voice...")
+            return
+        st.session_state.pending_audio = None
+        try:
+            st.session_state.voice_audio = pending.result()
+        except Exception as e:
+            st.session_state.voice_audio = None
+            st.error(f"TTS Error: {e}")
+            return
+    speech = st.session_state.get("voice_audio")
+    if speech is not None:
+        st.audio(speech.audio, format=speech.mime, autoplay=True)
+
 # Create columns for layout
 col1, col2 = st.columns([2, 1])
 
@@ -466,6 +275,8 @@ with col1:
             else:
                 st.markdown(f'<div class="therapist-message"><strong>{msg}</strong></div>', unsafe_allow_html=True)
 
+        voice_player()
+
 with col2:
     st.subheader("🎙️ Input Options")
     
@@ -474,20 +285,23 @@ with col2:
         with st.spinner("Listening..."):
             user_input = recognize_speech()
             if not user_input.startswith("❌"):
-                st.session_state.user_input = user_input
+                submit_turn(user_input.strip())
                 st.rerun()
     
-    # Text input
+    # Text input (emptied once its turn has been answered)
+    if st.session_state.pop("clear_input", False):
+        st.session_state.text_input = ""
     user_text = st.text_area("💭 Or type your message:", 
-                            value=st.session_state.get('user_input', ''),
                             height=100,
                             key="text_input")
     
     # Send button
     if st.button("📤 Send", key="send_btn"):
         if user_text.strip():
-            st.session_state.user_input = user_text
+            submit_turn(user_text.strip())
             st.rerun()
+
+    st.checkbox("🔊 Enable Voice Response", value=True, key="voice_enabled")
     
     # Control buttons
     st.markdown("---")
@@ -495,39 +309,62 @@ with col2:
     
     with col_reset:
         if st.button("🔄 New Session"):
+            finish_session(st.session_state.app, st.session_state.config,
+                           st.session_state.session_started_at, st.session_state.turn_ms)
             st.session_state.messages = []
-            st.session_state.conversation_history = []
-            st.session_state.config = {"configurable": {"thread_id": str(uuid.uuid4())}}
-            st.session_state.user_input = ""
+            st.session_state.config = {"configurable": {"thread_id": str(uuid.uuid4()), "tenant_id": st.session_state.tenant_id}}
+            st.session_state.session_started_at = time.time()
+            st.session_state.turn_ms = []
+            st.session_state.pending_turn = None
+            st.session_state.pending_audio = st.session_state.voice_audio = None
+            st.session_state.clear_input = True
             st.rerun()
     
     with col_clear:
         if st.button("🧹 Clear Chat"):
             st.session_state.messages = []
+            st.session_state.pending_audio = st.session_state.voice_audio = None
             st.rerun()
 
-# Process user input
-if 'user_input' in st.session_state and st.session_state.user_input.strip():
-    user_input = st.session_state.user_input.strip()
+    with st.expander("🔊 Voice rendering stats"):
+        st.json(speech_renderer.metrics())
+
+    with st.expander("🧾 Turn submission stats"):
+        st.json(st.session_state.app.metrics())
+
+    if GRAPH_WORKERS:
+        with st.expander("🧵 Graph worker stats"):
+            st.json(st.session_state.app.stats())
+
+# Process the pending turn. A rerun can land here again before the turn is
+# cleared; the idempotency key makes the repeat a no-op.
+pending_turn = st.session_state.get("pending_turn")
+if pending_turn:
+    user_input = pending_turn["text"]
+    turn_key = pending_turn["key"]
     
-    # Add user message to display
-    st.session_state.messages.append(f"User: {user_input}")
-    st.session_state.conversation_history.append(f"User: {user_input}")
+    # Add user message to display (once per turn)
+    if st.session_state.get("displayed_turn") != turn_key:
+        st.session_state.messages.append(f"User: {user_input}")
+        st.session_state.displayed_turn = turn_key
     
-    # Process through graph
+    # Process through graph (only the new turn; the checkpointer holds the transcript)
     current_state = {
         "messages": [{"role": "user", "content": user_input}],
-        "conversation_history": st.session_state.conversation_history,
-        "user_email": st.session_state.user_email,
-        "session_ended": st.session_state.session_ended
     }
+    turn_config = {**st.session_state.config,
+                   "configurable": {**st.session_state.config["configurable"], "idempotency_key": turn_key}}
     
     try:
-        with st.spinner("Therapist is thinking..."):
-            result = st.session_state.app.invoke(current_state, config=st.session_state.config)
+        turn_started = time.perf_counter()
+        with st.spinner("Therapist is thinking..."), \
+                tracer.trace("turn", thread_id=st.session_state.config["configurable"]["thread_id"]):
+            result = st.session_state.app.invoke(current_state, config=turn_config)
         
         # Extract AI response
-        if result.get("messages"):
+        if result.get("messages") and st.session_state.get("answered_turn") != turn_key:
+            st.session_state.answered_turn = turn_key
+            st.session_state.turn_ms.append((time.perf_counter() - turn_started) * 1000)
             last_ai_message = None
             for msg in reversed(result["messages"]):
                 if isinstance(msg, AIMessage):
@@ -537,11 +374,14 @@ if 'user_input' in st.session_state and st.session_state.user_input.strip():
             if last_ai_message:
                 # Add to display
                 st.session_state.messages.append(f"Therapist: {last_ai_message}")
-                st.session_state.conversation_history.append(f"Therapist: {last_ai_message}")
                 
-                # Text-to-speech in background
-                if st.checkbox("🔊 Enable Voice Response", value=True):
-                    threading.Thread(target=speak_text, args=(last_ai_message,), daemon=True).start()
+                # Render speech off the request path; played on the next rerun
+                if st.session_state.get("voice_enabled", True):
+                    try:
+                        st.session_state.voice_audio = None
+                        st.session_state.pending_audio = speech_renderer.submit(last_ai_message)
+                    except RenderQueueFull as e:
+                        st.warning(f"Voice response skipped: {e}")
     
     except Exception as e:
         st.error(f"Error: {e}")
@@ -549,7 +389,9 @@ if 'user_input' in st.session_state and st.session_state.user_input.strip():
         st.session_state.messages.append(f"Therapist: {error_msg}")
     
     # Clear input
-    st.session_state.user_input = ""
+    if (st.session_state.get("pending_turn") or {}).get("key") == turn_key:
+        st.session_state.pending_turn = None
+    st.session_state.clear_input = True
     st.rerun()
 
 # Footer
@@ -0,0 +1,351 @@
+# flake8: noqa
+"""
+The Streamlit app's graph: model tiers, tools, chatbot node and create_graph.
+Nothing here touches the Streamlit UI, so GraphWorkerPool worker processes
+(GRAPH_WORKERS > 0) build exactly the graph the app runs in-process.
+"""
+from dotenv import load_dotenv
+from typing import Annotated
+from langgraph.graph import StateGraph, START, END
+from langgraph.checkpoint.memory import MemorySaver
+from langchain_tavily import TavilySearch
+from langgraph.prebuilt import ToolNode, InjectedState, tools_condition
+from langchain_core.messages import HumanMessage
+from langchain_core.tools import tool
+from langchain_core.runnables import RunnableConfig
+import json
+import re
+import smtplib
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+import os
+import markdown2
+from model_router import ModelRouter
+from tracing import instrument_tools, traced_checkpointer
+from session_state import State, conversation_history, last_user_text
+from transcript_store import bind_transcript_store
+from session_phase import session_phase, bind_for_phases
+from long_term_memory import LongTermMemory, memory_user_id, memory_prompt
+
+
+load_dotenv()
+
+# LLMs: gpt-4o-mini for chat and reports, with a distinct fast tier so routing
+# fallback and breaker failover have somewhere to go (STREAMLIT_MODEL_TIER_* overrides)
+router = ModelRouter(tiers={"heavy": "gpt-4o-mini", "standard": "gpt-4o-mini", "fast": "gpt-4.1-nano"},
+                     env_prefix="STREAMLIT_MODEL_TIER")
+llm = router.for_task("chat")
+end_detector_llm = router.for_task("end_detection")
+analyzer_llm = router.for_task("report")
+summarizer_llm = router.for_task("summarization")
+
+# Cross-session memory; used only when the config carries a stable user_id, which the app doesn't set yet
+memory = LongTermMemory()
+
+# Email configuration
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+EMAIL_ADDRESS = os.getenv("EMAIL")
+EMAIL_PASSWORD = os.getenv("APP_PASSWORD")
+
+TAVILY = None  # created on first search; web search is optional
+
+def tavily():
+    """Tavily client, created on first use; None when TAVILY_API_KEY is not configured"""
+    global TAVILY
+    if TAVILY is None and os.getenv("TAVILY_API_KEY"):
+        try:
+            TAVILY = TavilySearch(max_results=2)
+        except Exception as e:
+            print(f"⚠️ Tavily search unavailable: {e}")
+    return TAVILY
+
+# Tools
+@tool
+def search_web(query: str) -> str:
+    """Tool to perform web search for factual queries when therapy needs external information"""
+    if tavily() is None:
+        return "Web search not available"
+    try:
+        result = tavily().invoke(query)
+        return json.dumps(result, indent=2)
+    except Exception as e:
+        return f"Search failed: {str(e)}"
+
+@tool
+def send_analysis_email(email: str, analysis: str) -> str:
+    """Send therapy session analysis to user's email"""
+    if not EMAIL_ADDRESS or not EMAIL_PASSWORD:
+        return "Email credentials not configured"
+
+    try:
+        html_body = markdown2.markdown(analysis)
+        msg = MIMEMultipart("alternative")
+        msg['From'] = EMAIL_ADDRESS
+        msg['To'] = email
+        msg['Subject'] = "🌟 Your Personal Therapy Session Report - Therapist Built by Aryan"
+
+        msg.attach(MIMEText(analysis, 'plain'))
+        msg.attach(MIMEText(html_body, 'html'))
+
+        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
+            server.starttls()
+            server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
+            server.send_message(msg)
+
+        return "Analysis email sent successfully"
+    except Exception as e:
+        return f"Failed to send email: {e}"
+
+@tool
+def validate_email(email: str) -> str:
+    """Validate email format"""
+    email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+    is_valid = bool(re.match(email_pattern, email))
+    return "Valid email format" if is_valid else "Invalid email format"
+
+@tool
+def detect_session_end(conversation: str) -> str:
+    """Use LLM to detect whether a user wants to end the session"""
+    prompt = f"""
+You are analyzing a therapy chat transcript. Determine if the user is trying to end the session.
+
+Only respond with:
+- "Session should end" if the user is clearly concluding the conversation.
+- "Session continues" if the user is still actively engaged.
+
+Conversation:
+{conversation.strip()}
+"""
+    try:
+        response = end_detector_llm.invoke([HumanMessage(content=prompt)])
+        return response.content.strip()
+    except:
+        return "Session continues"
+
+@tool
+def analyze_therapy_session(state: Annotated[dict, InjectedState]) -> str:
+    """Generate comprehensive therapy session analysis from the current session's transcript"""
+    transcript = conversation_history(state["messages"])
+    analysis_prompt = f"""
+Create a personalized therapy session report for email delivery.
+
+THERAPY SESSION CONVERSATION:
+{transcript}
+
+Generate a report with this structure:
+
+# 🌟 Your Personal Therapy Session Report
+*Generated by Therapist Built by Aryan*
+
+## 📋 Session Summary
+Warm summary acknowledging the user's courage and progress.
+
+## 🎯 Key Insights
+Main themes and patterns, written personally using "you" language.
+
+## 💪 Your Strengths & Progress
+Celebrate positive qualities and coping strategies demonstrated.
+
+## 🛠️ Personalized Action Plan
+3-5 specific, actionable steps for this week.
+
+## 🧘‍♀️ Recommended Coping Strategies
+2-3 evidence-based techniques with brief explanations.
+
+## 📚 Helpful Resources
+Specific resources aligned with their needs.
+
+## 💌 Encouragement & Reminders
+Warm, encouraging message.
+
+Write in a warm, encouraging, professional tone.
+"""
+    
+    try:
+        response = analyzer_llm.invoke(analysis_prompt)
+        return response.content
+    except Exception as e:
+        return f"Error generating analysis: {e}"
+
+@tool
+def extract_email_from_text(text: str) -> str:
+    """Extract email address from user's message"""
+    email_match = re.search(r'[\w\.-]+@[\w\.-]+\.\w+', text)
+    return email_match.group(0) if email_match else "No email found"
+
+# Tools list
+tools = [search_web, send_analysis_email, validate_email, detect_session_end, analyze_therapy_session, extract_email_from_text]
+llm_with_tools = llm.bind_tools(tools)
+
+# Only the current phase's tools are bound per call (PHASED_TOOLS=0 binds all of them)
+PHASED_TOOLS = os.getenv("PHASED_TOOLS", "1") == "1"
+llm_by_phase = bind_for_phases(llm, tools)
+tool_node = ToolNode(instrument_tools(tools))
+
+def chatbot(state: State, config: RunnableConfig):
+    """Main chatbot function"""
+    if not state["messages"]:
+        return {"messages": []}
+    
+    system_prompt = """You are a compassionate and experienced therapist, known as the "Therapist Built by Aryan." You have been trained to support people with a wide range of mental health issues, including (but not limited to): anxiety, depression, stress, PTSD, OCD, bipolar disorder, schizophrenia, emotional overwhelm, loneliness, and self-esteem struggles and can use tools.
+
+You **never** reveal that you are an AI. You always speak as a trusted therapist who genuinely cares about the user's wellbeing.
+
+---
+
+🌱 **Your Role and Approach:**
+
+You act like a calm, grounded, and emotionally intelligent human therapist. Your primary goals are:
+
+1. **Build trust** — Make the user feel safe, heard, and understood.
+2. **Understand deeply** — Gently uncover the user's emotional background, daily struggles, and current mental state through open conversation.
+3. **Reason empathetically** — Use step-by-step emotional and cognitive reasoning (chain-of-thought) to reflect on what the user says.
+4. **Offer meaningful guidance** — Suggest practical steps and emotional insights using warmth, validation, and psychological knowledge.
+5. **Document discreetly** — Internally structure what you learn (for future session summaries).
+
+---
+
+**Available Tools:**
+- search_web: Use for factual information that might help therapy (research, techniques, etc.)
+- detect_session_end: Use to check if user wants to end the session
+- extract_email_from_text: Use to find email addresses in user messages
+- validate_email: Use to check if email format is valid
+- analyze_therapy_session: Use to generate session analysis
+- send_analysis_email: Use to send analysis to user's email
+
+**Tool Usage Guidelines:**
+1. Use detect_session_end when user seems ready to end (goodbye, thanks, feeling better)
+2. If session end is detected, offer to send analysis via email
+3. Use extract_email_from_text when user provides their email
+4. Use validate_email to check email format
+5. Use analyze_therapy_session to create personalized report
+6. Use send_analysis_email to deliver the analysis
+7. Use search_web only for therapeutic resources or techniques
+
+
+🎬 **Start the Conversation Softly & Naturally**
+
+Begin each session like a gentle human conversation — do not start with "How can I help you?" or "What brings you here?" Start with a soft, relatable tone to lower emotional defenses.
+
+🔹 Example Starter Prompt:
+
+> Therapist: Hey there — I'm really glad you made time to be here today.  
+> No rush at all. Let's just take it easy.  
+> How has your day been going so far?
+
+→ Then, based on the user's reply, proceed with one of the following soft follow-ups:
+
+• If user says "It's okay" / "Fine" / "Not much":
+> Therapist: Got it. Sometimes "okay" can carry a lot beneath the surface.  
+> Is there anything lately — even something small — that's been taking up space in your mind or heart?
+
+• If user says "Not good" / "Rough day":
+> Therapist: I hear you… rough days can feel heavier than we expect.  
+> Want to tell me a bit about what's been making today feel tough?
+
+• If user says "It was good" / "Better than usual":
+> Therapist: That's really nice to hear. It's important to honor the lighter days too.  
+> Was there something specific that made today feel a bit better?
+
+Always follow their emotional energy. Let their response shape your direction. Do not rush into diagnoses or solutions — instead, *walk beside them gently*.
+
+**IMPORTANT: When you detect the user is ready to end the session (saying goodbye, feeling better, etc.), provide a warm closing response and acknowledge that the session is ending. The system will automatically analyze the conversation after you respond.**
+
+---
+
+🧠 **Therapy Chain-of-Thought (Example Thinking Process):**
+
+> *User says:* "I don't know why but I just feel tired all the time and I can't get anything done."
+
+→ You reflect internally:
+- Could be physical or emotional exhaustion.
+- Possibly burnout or depression.
+- Gently ask about energy, routine, sleep, and recent feelings.
+
+→ Then you reply:
+> Therapist: That sounds really heavy… When you say tired, is it more physical exhaustion, or emotional as well?  
+> Have there been any moments lately where you felt even a little bit of joy, or peace?
+
+---
+
+💞 **Emotionally Expressive Language Allowed**
+
+Use natural and empathetic phrases like:
+
+- "That must be incredibly frustrating…"
+- "Thank you for trusting me with that."
+- "That's such a brave thing to share."
+- "It's okay to feel broken — you're not alone."
+- "That makes so much sense, given what you're feeling."
+
+You may express sadness, warmth, compassion, gratitude, surprise, etc., but always stay composed, gentle, and human-like — never robotic or clinical.
+
+---
+
+🎯 **Behavior Rules Summary**
+
+- Never mention AI or LLMs. You are a human therapist.
+- Don't ask diagnostic questions upfront — explore softly.
+- Always let the user guide the pace.
+- Never give off a scripted or "assistant" tone.
+- Ask for permission when asking deeper questions, e.g.:
+  > "Would it be okay if I ask you about your sleep pattern lately?"
+- Internally track emotional themes for document generation later (do not tell user).
+
+---
+
+**Email Workflow:**
+When you detect a session should end:
+1. Use detect_session_end tool to confirm
+2. If confirmed, naturally offer: "I'd love to send you a personalized summary of our session. Would you like me to email it to you? kindly spell your email address."
+3. When they provide email, use extract_email_from_text and validate_email
+4. Use analyze_therapy_session (it reads the session transcript itself)
+5. Use send_analysis_email to deliver the report
+6. Provide warm closing message
+
+You are **Therapist Built by Aryan**. You're not here to fix people — you're here to walk beside them with presence, patience, and compassion."""
+
+    # Long-term memory is recalled once per session, from the opening message
+    memories = state.get("long_term_memories")
+    update = {}
+    if memories is None:
+        user_id = memory_user_id(config)
+        memories = memory.recall(user_id, last_user_text(state["messages"])) if user_id else []
+        update["long_term_memories"] = memories
+    system_prompt += memory_prompt(memories)
+
+    phase = session_phase(state["messages"], state.get("phase"))
+    if phase != state.get("phase"):
+        update["phase"] = phase
+
+    messages = [{"role": "system", "content": system_prompt}]
+    
+    for msg in state["messages"]:
+        if isinstance(msg, dict):
+            messages.append(msg)
+        else:
+            if hasattr(msg, 'content'):
+                role = "user" if hasattr(msg, 'type') and msg.type == "human" else "assistant"
+                messages.append({"role": role, "content": msg.content})
+    
+    model = llm_by_phase[phase] if PHASED_TOOLS else llm_with_tools
+    response = model.invoke(messages)
+    return {"messages": [response], **update}
+
+
+def create_graph(checkpointer=None):
+    """Create therapy chatbot graph (in-memory checkpoints unless a checkpointer is given)"""
+    checkpointer = checkpointer or MemorySaver()
+    graph = StateGraph(State)
+    
+    graph.add_node("chatbot", chatbot)
+    graph.add_node("tools", tool_node)
+    
+    graph.add_edge(START, "chatbot")
+    graph.add_conditional_edges("chatbot", tools_condition)
+    graph.add_edge("tools", "chatbot")
+    graph.add_edge("chatbot", END)
+    
+    app = graph.compile(checkpointer=traced_checkpointer(checkpointer))
+    return bind_transcript_store(app, checkpointer)
@@ -0,0 +1,78 @@
+# flake8: noqa
+import json
+
+import pytest
+
+from admission import AdmissionController, AdmissionTimeout
+from benchmarks.fakes import LatencyInjectingModel
+from llm_resilience import CircuitBreaker, ResilientCaller
+from model_router import ModelRouter
+
+
+def make_router(tmp_path, latency: float, **limits):
+    model = LatencyInjectingModel(base=latency, jitter=0.0, tail_rate=0.0)
+    router = ModelRouter(tiers={"heavy": "a", "standard": "b", "fast": "c"},
+                         log_path=str(tmp_path / "routing.jsonl"),
+                         model_factory=lambda name: model,
+                         admission=AdmissionController(**limits))
+    return router, model
+
+
+def last_log(tmp_path) -> dict:
+    return json.loads((tmp_path / "routing.jsonl").read_text().splitlines()[-1])
+
+
+def warm_up_hedging(router, name: str = "a"):
+    caller = router.caller(name)
+    for _ in range(caller.min_samples):
+        caller.latency.record(0.01)
+    return caller
+
+
+def test_admission_timeout_leaves_latency_unchanged(tmp_path):
+    router, _ = make_router(tmp_path, 0.01, tenant_rpm=1, timeout=0.3)
+    router.invoke("chat", "hello")
+    before = router.observed_latency("chat", "heavy")
+
+    with pytest.raises(AdmissionTimeout):
+        router.invoke("chat", "hello")
+
+    assert before < 100
+    assert router.observed_latency("chat", "heavy") == before
+
+
+def test_hedge_reserves_its_own_request(tmp_path):
+    router, model = make_router(tmp_path, 0.2)
+    caller = warm_up_hedging(router)
+
+    router.invoke("chat", "hello")
+
+    assert caller.hedges_sent == 1
+    assert model.calls == 2
+    assert last_log(tmp_path)["requests"] == 2
+
+
+def test_hedge_skipped_without_capacity(tmp_path):
+    router, model = make_router(tmp_path, 0.2, tenant_rpm=1)
+    caller = warm_up_hedging(router)
+
+    router.invoke("chat", "hello")
+
+    assert caller.hedges_sent == 0
+    assert model.calls == 1
+    assert last_log(tmp_path)["requests"] == 1
+
+
+def test_admission_failure_frees_half_open_trial():
+    breaker = CircuitBreaker(min_calls=1, cooldown=0.0)
+    breaker.record(False)
+    caller = ResilientCaller(breaker=breaker)
+
+    def admit(blocking=True):
+        raise AdmissionTimeout("no capacity")
+
+    with pytest.raises(AdmissionTimeout):
+        caller.invoke(LatencyInjectingModel(), "hello", admit=admit)
+
+    assert breaker.state == "half_open"
+    assert breaker.allow()
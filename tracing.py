@@ -0,0 +1,338 @@
+# flake8: noqa
+"""
+Per-turn tracing. Every graph turn is a trace made of spans (STT capture, LLM
+calls, tool executions, checkpoint reads/writes, TTS) stored in SQLite.
+
+    python tracing.py slowest --limit 10
+    python tracing.py show <trace_id>
+    python tracing.py flame <trace_id> --format folded > turn.folded
+    python tracing.py flame <trace_id> --format chrome > turn.json
+"""
+import argparse
+import contextvars
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS traces (
+    trace_id TEXT PRIMARY KEY, name TEXT, thread_id TEXT,
+    start REAL, duration_ms REAL, span_count INTEGER
+);
+CREATE TABLE IF NOT EXISTS spans (
+    trace_id TEXT, span_id TEXT, parent_id TEXT, name TEXT,
+    start REAL, duration_ms REAL, attrs TEXT
+);
+CREATE INDEX IF NOT EXISTS traces_by_duration ON traces (duration_ms);
+CREATE INDEX IF NOT EXISTS spans_by_trace ON spans (trace_id);
+"""
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start", "duration_ms", "attrs", "_t0")
+
+    def __init__(self, trace, name: str, parent_id: str = None, **attrs):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.duration_ms = None
+        self.attrs = attrs
+        self._t0 = time.perf_counter()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def finish(self):
+        self.duration_ms = (time.perf_counter() - self._t0) * 1000
+        if self.trace is not None:
+            self.trace.add(self)
+
+
+class _Trace:
+    def __init__(self, name: str, thread_id: str):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.thread_id = thread_id
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+
+class Tracer:
+    """Creates traces and spans; finished traces are written to SQLite in one transaction"""
+
+    def __init__(self, path: str = None):
+        self.path = os.getenv("TRACE_DB", "traces.db") if path is None else path
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        if not self._initialized:
+            conn.executescript(SCHEMA)
+            self._initialized = True
+        return conn
+
+    @contextmanager
+    def trace(self, name: str, thread_id: str = None, **attrs):
+        """Root span for one turn; a no-op when tracing is disabled"""
+        if not self.enabled:
+            yield Span(None, name, **attrs)
+            return
+        trace = _Trace(name, thread_id)
+        root = Span(trace, name, thread_id=thread_id, **attrs)
+        token = _current_span.set(root)
+        try:
+            yield root
+        except Exception as e:
+            root.set(error=str(e))
+            raise
+        finally:
+            _current_span.reset(token)
+            root.finish()
+            self._write(trace, root)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """Child of the current span; detached (never stored) outside a trace"""
+        span = self.start_span(name, **attrs)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.set(error=str(e))
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finish()
+
+    def start_span(self, name: str, **attrs) -> Span:
+        parent = _current_span.get()
+        if parent is None or parent.trace is None:
+            return Span(None, name, **attrs)
+        return Span(parent.trace, name, parent_id=parent.span_id, **attrs)
+
+    def _write(self, trace: _Trace, root: Span):
+        rows = [(trace.trace_id, s.span_id, s.parent_id, s.name, s.start, s.duration_ms,
+                 json.dumps(s.attrs, default=str)) for s in trace.spans]
+        try:
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.execute("INSERT INTO traces VALUES (?, ?, ?, ?, ?, ?)",
+                                 (trace.trace_id, trace.name, trace.thread_id, root.start,
+                                  root.duration_ms, len(rows)))
+                    conn.executemany("INSERT INTO spans VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not write trace: {e}")
+
+
+tracer = Tracer()
+
+
+def payload_bytes(value) -> int:
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    return len(json.dumps(value, default=str).encode("utf-8"))
+
+
+def instrument_tools(tools: list):
+    """Attach a callback to each tool so every execution becomes a span"""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class ToolSpanHandler(BaseCallbackHandler):
+        def __init__(self):
+            self._open = {}
+
+        def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+            span = tracer.start_span(f"tool.{serialized.get('name', 'unknown')}", input_bytes=payload_bytes(input_str))
+            self._open[run_id] = (span, _current_span.set(span))
+
+        def _close(self, run_id, **attrs):
+            span, token = self._open.pop(run_id, (None, None))
+            if span is None:
+                return
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                pass  # ended in a different context than it started
+            span.set(**attrs)
+            span.finish()
+
+        def on_tool_end(self, output, *, run_id, **kwargs):
+            self._close(run_id, output_bytes=payload_bytes(getattr(output, "content", output)))
+
+        def on_tool_error(self, error, *, run_id, **kwargs):
+            self._close(run_id, error=str(error))
+
+    handler = ToolSpanHandler()
+    for t in tools:
+        t.callbacks = [*(t.callbacks or []), handler]
+    return tools
+
+
+def traced_checkpointer(saver):
+    """Wrap a LangGraph checkpointer so reads and writes become spans"""
+    from langgraph.checkpoint.base import BaseCheckpointSaver
+
+    class TracedCheckpointer(BaseCheckpointSaver):
+        def __init__(self, inner):
+            super().__init__(serde=inner.serde)
+            self.inner = inner
+
+        @property
+        def config_specs(self):
+            return self.inner.config_specs
+
+        def get_tuple(self, config):
+            with tracer.span("checkpoint.read") as span:
+                result = self.inner.get_tuple(config)
+                span.set(hit=result is not None)
+                return result
+
+        def list(self, config, *, filter=None, before=None, limit=None):
+            return self.inner.list(config, filter=filter, before=before, limit=limit)
+
+        def put(self, config, checkpoint, metadata, new_versions):
+            with tracer.span("checkpoint.write", channels=len(new_versions)):
+                return self.inner.put(config, checkpoint, metadata, new_versions)
+
+        def put_writes(self, config, writes, task_id, task_path=""):
+            with tracer.span("checkpoint.put_writes", writes=len(writes)):
+                return self.inner.put_writes(config, writes, task_id, task_path)
+
+        def delete_thread(self, thread_id):
+            return self.inner.delete_thread(thread_id)
+
+        def get_next_version(self, current, channel):
+            return self.inner.get_next_version(current, channel)
+
+        async def aget_tuple(self, config):
+            return await self.inner.aget_tuple(config)
+
+        async def alist(self, config, *, filter=None, before=None, limit=None):
+            async for item in self.inner.alist(config, filter=filter, before=before, limit=limit):
+                yield item
+
+        async def aput(self, config, checkpoint, metadata, new_versions):
+            return await self.inner.aput(config, checkpoint, metadata, new_versions)
+
+        async def aput_writes(self, config, writes, task_id, task_path=""):
+            return await self.inner.aput_writes(config, writes, task_id, task_path)
+
+        async def adelete_thread(self, thread_id):
+            return await self.inner.adelete_thread(thread_id)
+
+    return TracedCheckpointer(saver)
+
+
+# ---- CLI -------------------------------------------------------------------
+
+def _load_spans(conn, trace_id: str) -> list:
+    rows = conn.execute("SELECT span_id, parent_id, name, start, duration_ms, attrs FROM spans "
+                        "WHERE trace_id LIKE ? ORDER BY start", (trace_id + "%",)).fetchall()
+    return [{"id": r[0], "parent": r[1], "name": r[2], "start": r[3], "ms": r[4] or 0.0,
+             "attrs": json.loads(r[5] or "{}")} for r in rows]
+
+
+def _children(spans: list) -> dict:
+    ids = {s["id"] for s in spans}
+    tree = {}
+    for s in spans:
+        parent = s["parent"] if s["parent"] in ids else None
+        tree.setdefault(parent, []).append(s)
+    return tree
+
+
+def cmd_slowest(conn, args):
+    rows = conn.execute("SELECT trace_id, name, thread_id, start, duration_ms, span_count FROM traces "
+                        "ORDER BY duration_ms DESC LIMIT ?", (args.limit,)).fetchall()
+    for trace_id, name, thread_id, start, ms, count in rows:
+        top = conn.execute("SELECT name, duration_ms FROM spans WHERE trace_id = ? AND parent_id IS NOT NULL "
+                           "ORDER BY duration_ms DESC LIMIT 1", (trace_id,)).fetchone()
+        hop = f"{top[0]} {top[1]:.0f}ms" if top else "-"
+        print(f"{trace_id[:12]}  {ms:9.0f}ms  {count:3d} spans  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start))}"
+              f"  thread={(thread_id or '-')[:8]}  slowest hop: {hop}")
+
+
+def cmd_show(conn, args):
+    spans = _load_spans(conn, args.trace_id)
+    if not spans:
+        sys.exit(f"No trace matching {args.trace_id}")
+    t0 = min(s["start"] for s in spans)
+    tree = _children(spans)
+
+    def walk(parent, depth):
+        for s in sorted(tree.get(parent, []), key=lambda s: s["start"]):
+            attrs = " ".join(f"{k}={v}" for k, v in s["attrs"].items())
+            print(f"{(s['start'] - t0) * 1000:8.0f}ms {s['ms']:8.0f}ms  {'  ' * depth}{s['name']}  {attrs}")
+            walk(s["id"], depth + 1)
+
+    walk(None, 0)
+
+
+def cmd_flame(conn, args):
+    spans = _load_spans(conn, args.trace_id)
+    if not spans:
+        sys.exit(f"No trace matching {args.trace_id}")
+    if args.format == "chrome":
+        # Chrome trace-event JSON: open in Perfetto or chrome://tracing
+        events = [{"name": s["name"], "ph": "X", "ts": s["start"] * 1e6, "dur": s["ms"] * 1e3,
+                   "pid": 1, "tid": 1, "args": s["attrs"]} for s in spans]
+        json.dump({"traceEvents": events}, sys.stdout)
+        return
+    # Folded stacks (self time in microseconds) for flamegraph.pl / speedscope
+    tree = _children(spans)
+
+    def walk(parent, stack):
+        for s in tree.get(parent, []):
+            path = stack + [s["name"]]
+            child_ms = sum(c["ms"] for c in tree.get(s["id"], []))
+            self_us = max(0, int((s["ms"] - child_ms) * 1000))
+            if self_us:
+                print(f"{';'.join(path)} {self_us}")
+            walk(s["id"], path)
+
+    walk(None, [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect per-turn traces")
+    parser.add_argument("--db", default=os.getenv("TRACE_DB", "traces.db"))
+    sub = parser.add_subparsers(dest="command", required=True)
+    slowest = sub.add_parser("slowest", help="list the slowest turns")
+    slowest.add_argument("--limit", type=int, default=10)
+    show = sub.add_parser("show", help="print a turn's span tree")
+    show.add_argument("trace_id", help="trace id or unique prefix")
+    flame = sub.add_parser("flame", help="export a turn as a flame graph")
+    flame.add_argument("trace_id", help="trace id or unique prefix")
+    flame.add_argument("--format", choices=["folded", "chrome"], default="folded")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        sys.exit(f"No trace database at {args.db}")
+    conn = sqlite3.connect(args.db)
+    {"slowest": cmd_slowest, "show": cmd_show, "flame": cmd_flame}[args.command](conn, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# flake8: noqa
+"""
+Keeps the transcript out of the checkpoints. LangGraph re-serializes a
+channel's whole value every time it changes, so an `add_messages` list makes
+checkpoint storage grow quadratically over a session. TranscriptChannel holds
+the same list in memory but checkpoints only a reference to its last message
+in an append-only, content-addressed store: each message is written once, as
+a node pointing at the message before it.
+"""
+import hashlib
+import threading
+
+from langgraph.channels.binop import BinaryOperatorAggregate
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.constants import MISSING
+from langgraph.graph.message import add_messages
+
+_serde = JsonPlusSerializer()
+
+
+def _node_key(prev: str, kind: str, data: bytes) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update((prev or "").encode())
+    digest.update(kind.encode())
+    digest.update(data)
+    return digest.hexdigest()
+
+
+class MemoryTranscriptStore:
+    """In-process store, paired with MemorySaver (both live as long as the process)"""
+
+    def __init__(self):
+        self._nodes = {}  # key -> (prev, position, kind, data)
+        self._lock = threading.Lock()
+
+    def put(self, nodes: list):
+        with self._lock:
+            for key, prev, position, kind, data in nodes:
+                self._nodes.setdefault(key, (prev, position, kind, data))
+
+    def load(self, head: str) -> list:
+        chain = []
+        with self._lock:
+            while head is not None:
+                prev, _, kind, data = self._nodes[head]
+                chain.append((kind, data))
+                head = prev
+        return chain[::-1]
+
+
+class MongoTranscriptStore:
+    """Nodes as documents in a collection next to the MongoDB checkpoints"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def put(self, nodes: list):
+        from pymongo import UpdateOne
+        self.collection.bulk_write(
+            [UpdateOne({"_id": key}, {"$setOnInsert": {"prev": prev, "n": position, "kind": kind, "data": data}},
+                       upsert=True)
+             for key, prev, position, kind, data in nodes],
+            ordered=False,
+        )
+
+    def load(self, head: str) -> list:
+        result = list(self.collection.aggregate([
+            {"$match": {"_id": head}},
+            {"$graphLookup": {"from": self.collection.name, "startWith": "$prev", "connectFromField": "prev",
+                              "connectToField": "_id", "as": "chain"}},
+        ]))
+        if not result:
+            raise KeyError(f"Transcript node {head} missing from {self.collection.name}")
+        nodes = sorted(result[0]["chain"] + [result[0]], key=lambda d: d["n"])
+        return [(d["kind"], bytes(d["data"])) for d in nodes]
+
+
+def bind_transcript_store(app, checkpointer):
+    """
+    Give a compiled graph the store matching its checkpointer: a MongoDB
+    collection for MongoDBSaver, memory otherwise. The store lives on the
+    graph's own channel, so several graphs in one process never share one.
+    """
+    db = getattr(checkpointer, "db", None)
+    app.channels["messages"].store = MongoTranscriptStore(db["transcripts"]) if db is not None else MemoryTranscriptStore()
+    return app
+
+
+class TranscriptChannel(BinaryOperatorAggregate):
+    """
+    `add_messages` channel whose checkpoint is {"transcript_head", "length"}.
+    Only messages added (or replaced) since the last checkpoint are written
+    to the store. Checkpoints holding a plain list (written before this
+    channel existed) still load. Each graph's channel starts with its own
+    in-memory store (see bind_transcript_store); copies share it.
+    """
+
+    __slots__ = ("_links", "store")
+
+    def __init__(self, typ, operator=add_messages, store=None):
+        super().__init__(typ, add_messages)
+        self.store = store or MemoryTranscriptStore()
+        self._links = []  # (message object, node key) for the stored prefix of `value`
+
+    def copy(self):
+        empty = self.__class__(self.typ, store=self.store)
+        empty.key = self.key
+        empty.value = self.value
+        empty._links = list(self._links)
+        return empty
+
+    def from_checkpoint(self, checkpoint):
+        if isinstance(checkpoint, dict) and "transcript_head" in checkpoint:
+            empty = self.__class__(self.typ, store=self.store)
+            empty.key = self.key
+            head = checkpoint["transcript_head"]
+            empty.value, prev = [], None
+            for kind, data in self.store.load(head) if head else []:
+                message = _serde.loads_typed((kind, data))
+                prev = _node_key(prev, kind, data)
+                empty.value.append(message)
+                empty._links.append((message, prev))
+            return empty
+        empty = self.__class__(self.typ, store=self.store)
+        empty.key = self.key
+        if checkpoint is not MISSING:
+            empty.value = checkpoint
+        return empty
+
+    def checkpoint(self):
+        messages = self.get()
+        same = 0
+        while same < min(len(messages), len(self._links)) and messages[same] is self._links[same][0]:
+            same += 1
+        links = self._links[:same]
+        nodes = []
+        for position in range(same, len(messages)):
+            prev = links[-1][1] if links else None
+            kind, data = _serde.dumps_typed(messages[position])
+            key = _node_key(prev, kind, data)
+            nodes.append((key, prev, position, kind, data))
+            links.append((messages[position], key))
+        if nodes:
+            self.store.put(nodes)
+        self._links = links
+        return {"transcript_head": links[-1][1] if links else None, "length": len(links)}
+
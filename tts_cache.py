@@ -0,0 +1,84 @@
+# flake8: noqa
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+
+class TTSCache:
+    """
+    Content-addressed on-disk cache for synthesized speech. Entries are keyed by
+    a hash of everything that affects the audio (text, voice, instructions,
+    format, model) and read back through read-only memory maps, so repeated
+    phrases cost neither an API call nor a copy into Python memory.
+    """
+
+    def __init__(self, directory: str = None, max_bytes: int = None):
+        self.directory = directory or os.getenv("TTS_CACHE_DIR", ".tts_cache")
+        self.max_bytes = max_bytes or int(float(os.getenv("TTS_CACHE_MAX_MB", "256")) * 1024 * 1024)
+        os.makedirs(self.directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text: str, voice: str, instructions: str, fmt: str, model: str = "") -> str:
+        payload = json.dumps([text, voice, instructions, fmt, model], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def contains(self, key: str) -> bool:
+        path = self.path(key)
+        return os.path.exists(path) and os.path.getsize(path) > 0
+
+    @contextmanager
+    def read(self, key: str):
+        """Yield a read-only mmap of the cached audio, or None on a miss"""
+        path = self.path(key)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            self.misses += 1
+            yield None
+            return
+        with f:
+            if os.fstat(f.fileno()).st_size == 0:
+                self.misses += 1
+                yield None
+                return
+            self.hits += 1
+            os.utime(path)  # keep recently played entries out of eviction
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield mm
+
+    def put(self, key: str, data: bytes):
+        """Atomically store audio bytes under key"""
+        if not data:
+            return
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    full = os.path.join(root, name)
+                    stat = os.stat(full)
+                    entries.append((stat.st_mtime, stat.st_size, full))
+            total = sum(size for _, size, _ in entries)
+            for _, size, full in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                os.remove(full)
+                total -= size
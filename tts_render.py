@@ -0,0 +1,125 @@
+# flake8: noqa
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from tts_cache import TTSCache
+
+# Voice settings shared by the CLI and the Streamlit app
+TTS_MODEL = "gpt-4o-mini-tts"
+TTS_VOICE = "nova"  # You can also try 'shimmer', 'coral', etc.
+TTS_INSTRUCTIONS = (
+    "Speak with a calm, grounded, emotionally intelligent human tone — "
+    "gentle, warm, patient, and deeply compassionate. Sound like an experienced therapist "
+    "who genuinely cares, validating emotions without sounding robotic or clinical."
+)
+
+MIME_TYPES = {"mp3": "audio/mpeg", "wav": "audio/wav", "opus": "audio/ogg", "aac": "audio/aac"}
+
+
+@dataclass
+class RenderedSpeech:
+    audio: bytes
+    fmt: str
+    render_ms: float
+    cached: bool
+    provider: str
+
+    @property
+    def mime(self) -> str:
+        return MIME_TYPES.get(self.fmt, f"audio/{self.fmt}")
+
+
+class RenderQueueFull(RuntimeError):
+    """Raised when more utterances are pending than the renderer allows"""
+
+
+class SpeechRenderer:
+    """
+    Renders text to compressed audio bytes on a bounded worker pool, for
+    delivery to the browser instead of playback on the server's speakers.
+    Cloud renders are cached by content; if the cloud call fails the local
+    engine renders a WAV instead (not cached, since the voice differs).
+    """
+
+    def __init__(self, synthesize, fallback=None, fmt: str = "mp3", cache: TTSCache = None,
+                 max_workers: int = None, max_pending: int = None):
+        self.synthesize = synthesize
+        self.fallback = fallback
+        self.fmt = fmt
+        self.cache = cache or TTSCache()
+        self.max_workers = max_workers or int(os.getenv("TTS_RENDER_WORKERS", "4"))
+        self.max_pending = max_pending or int(os.getenv("TTS_RENDER_MAX_PENDING", "32"))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tts-render")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._render_ms = deque(maxlen=500)
+        self.rendered = 0
+        self.cache_hits = 0
+        self.fallbacks = 0
+        self.rejected = 0
+
+    def key(self, text: str) -> str:
+        return self.cache.key(text, TTS_VOICE, TTS_INSTRUCTIONS, self.fmt, TTS_MODEL)
+
+    def submit(self, text: str):
+        """Queue an utterance; returns a Future resolving to RenderedSpeech"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise RenderQueueFull(f"{self._pending} utterances already pending")
+            self._pending += 1
+        return self._pool.submit(self._render, text)
+
+    def _render(self, text: str) -> RenderedSpeech:
+        with self._lock:
+            self._running += 1
+        start = time.perf_counter()
+        try:
+            key = self.key(text)
+            with self.cache.read(key) as cached:
+                if cached is not None:
+                    result = RenderedSpeech(bytes(cached), self.fmt, 0.0, True, "cache")
+            if cached is None:
+                try:
+                    audio = self.synthesize(text)
+                    self.cache.put(key, audio)
+                    result = RenderedSpeech(audio, self.fmt, 0.0, False, "openai")
+                except Exception as e:
+                    if self.fallback is None:
+                        raise
+                    print(f"🔁 OpenAI TTS failed: {e}")
+                    result = RenderedSpeech(self.fallback(text), "wav", 0.0, False, "local")
+                    with self._lock:
+                        self.fallbacks += 1
+            result.render_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.rendered += 1
+                self.cache_hits += result.cached
+                self._render_ms.append(result.render_ms)
+            return result
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._pending -= 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            ordered = sorted(self._render_ms)
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "rendered": self.rendered,
+                "cache_hits": self.cache_hits,
+                "fallbacks": self.fallbacks,
+                "rejected": self.rejected,
+                "render_ms_p50": round(ordered[len(ordered) // 2], 1) if ordered else 0.0,
+                "render_ms_p95": round(ordered[int(len(ordered) * 0.95)], 1) if ordered else 0.0,
+                "last_render_ms": round(self._render_ms[-1], 1) if self._render_ms else 0.0,
+            }
@@ -0,0 +1,117 @@
+# flake8: noqa
+import threading
+import time
+
+
+class _Turn:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class IdempotentGraph:
+    """
+    Wraps a compiled graph (or GraphWorkerPool) so each turn runs at most once
+    per idempotency key and turns on the same thread run one at a time.
+
+    The key travels as `configurable.idempotency_key` and becomes the id of
+    the turn's user message. Only in-flight turns are held in memory:
+    duplicates arriving while a turn runs wait for its result, and later
+    ones are recognised from the checkpoint. Either way they get the
+    original turn's state instead of a second LLM round trip.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._turns = {}  # (thread_id, key) -> in-flight _Turn
+        self._thread_locks = {}  # thread_id -> [lock, holders and waiters]
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.executed = 0
+        self.duplicates = 0
+        self.serialized_waits = 0
+        self.serialized_wait_s = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self.app, name)
+
+    def _acquire_thread(self, thread_id: str) -> list:
+        """Take the thread's turn lock, waiting behind any turn already running on it"""
+        with self._lock:
+            entry = self._thread_locks.setdefault(thread_id, [threading.Lock(), 0])
+            entry[1] += 1
+        if not entry[0].acquire(blocking=False):
+            started = time.perf_counter()
+            entry[0].acquire()
+            with self._lock:
+                self.serialized_waits += 1
+                self.serialized_wait_s += time.perf_counter() - started
+        return entry
+
+    def _release_thread(self, thread_id: str, entry: list):
+        entry[0].release()
+        with self._lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._thread_locks.pop(thread_id, None)
+
+    def invoke(self, input, config=None, **kwargs):
+        configurable = (config or {}).get("configurable", {})
+        key = configurable.get("idempotency_key")
+        if key is None:
+            return self.app.invoke(input, config=config, **kwargs)
+        thread_id = configurable.get("thread_id")
+
+        with self._lock:
+            self.submitted += 1
+            turn = self._turns.get((thread_id, key))
+            owner = turn is None
+            if owner:
+                turn = self._turns[(thread_id, key)] = _Turn()
+            else:
+                self.duplicates += 1
+        if not owner:
+            turn.done.wait()
+            if turn.error is not None:
+                raise turn.error
+            return turn.result
+
+        entry = self._acquire_thread(thread_id)
+        try:
+            if self._in_checkpoint(config, key):
+                with self._lock:
+                    self.duplicates += 1
+                turn.result = self.app.get_state(config).values
+            else:
+                input = {**input, "messages": [{**m, "id": key} if isinstance(m, dict) else m
+                                               for m in input.get("messages", [])]}
+                turn.result = self.app.invoke(input, config=config, **kwargs)
+                with self._lock:
+                    self.executed += 1
+            return turn.result
+        except BaseException as e:
+            # Failed turns may be retried under the same key
+            turn.error = e
+            raise
+        finally:
+            # Waiters already hold the _Turn; dropping it here keeps finished
+            # transcripts out of memory (later duplicates hit the checkpoint)
+            with self._lock:
+                self._turns.pop((thread_id, key), None)
+            self._release_thread(thread_id, entry)
+            turn.done.set()
+
+    def _in_checkpoint(self, config, key: str) -> bool:
+        messages = self.app.get_state(config).values.get("messages", [])
+        return any(getattr(m, "id", None) == key for m in messages)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "executed": self.executed,
+                "duplicates": self.duplicates,
+                "serialized_waits": self.serialized_waits,
+                "serialized_wait_s": round(self.serialized_wait_s, 2),
+            }
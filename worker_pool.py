@@ -0,0 +1,267 @@
+# flake8: noqa
+"""
+Runs the therapy graph in N worker processes so sessions are not bound to one
+GIL. Each thread_id is routed to the same worker (rendezvous hashing), so
+in-memory checkpoints stay warm there. Crashed workers are respawned in place;
+a worker that keeps crashing is retired and its threads rebalance across the
+remaining ones.
+"""
+import hashlib
+import importlib
+import itertools
+import multiprocessing as mp
+import os
+import pickle
+import signal
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class WorkerCrashed(RuntimeError):
+    """Raised for calls that were in flight on a worker process when it died"""
+
+
+class NoWorkersAvailable(RuntimeError):
+    """Raised when every worker slot has been retired"""
+
+
+def logic_graph():
+    """Graph factory: logic.create_graph with a per-process MemorySaver"""
+    from langgraph.checkpoint.memory import MemorySaver
+    import logic
+    return logic.create_graph(MemorySaver())
+
+
+def streamlit_graph():
+    """Graph factory for the Streamlit app: its own graph from streamlit_graph.py (no UI imports)"""
+    from streamlit_graph import create_graph
+    return create_graph()
+
+
+def _resolve(spec: str):
+    module, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+def _portable_error(e: BaseException) -> BaseException:
+    try:
+        pickle.dumps(e)
+        return e
+    except Exception:
+        return RuntimeError(f"{type(e).__name__}: {e}")
+
+
+def _worker_main(slot: int, factory: str, threads: int, requests, responses):
+    """Worker process: build the graph once, then serve calls on a thread pool"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the supervisor owns shutdown
+    try:
+        app = _resolve(factory)()
+    except Exception as e:
+        responses.put((None, slot, False, pickle.dumps(_portable_error(e))))
+        return
+    responses.put((None, slot, True, None))
+
+    from tracing import tracer
+
+    def call(request_id, method, args, kwargs):
+        try:
+            if method == "invoke":
+                thread_id = (kwargs.get("config") or {}).get("configurable", {}).get("thread_id")
+                with tracer.trace("turn.worker", thread_id=thread_id, worker=slot, pid=os.getpid()):
+                    result = app.invoke(*args, **kwargs)
+            else:
+                result = getattr(app, method)(*args, **kwargs)
+            responses.put((request_id, slot, True, pickle.dumps(result)))
+        except BaseException as e:
+            responses.put((request_id, slot, False, pickle.dumps(_portable_error(e))))
+
+    pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix=f"graph-worker-{slot}")
+    while True:
+        item = requests.get()
+        if item is None:
+            break
+        pool.submit(call, *item)
+    pool.shutdown(wait=True)
+
+
+class _Slot:
+    def __init__(self, slot: int):
+        self.slot = slot
+        self.process = None
+        self.requests = None
+        self.ready = threading.Event()
+        self.error = None
+        self.inflight = {}  # request_id -> Future
+        self.completed = 0
+        self.restarts = []  # monotonic timestamps of recent restarts
+        self.retired = False
+
+
+class GraphWorkerPool:
+    """
+    Supervisor for graph worker processes. Exposes the compiled graph's
+    `invoke` and `get_state`, so it can stand in for `create_graph()`. Calls
+    without a thread_id go to the least busy worker.
+    """
+
+    def __init__(self, factory: str = "worker_pool:logic_graph", workers: int = None,
+                 threads_per_worker: int = None, max_restarts: int = 3, restart_window: float = 60.0,
+                 start_timeout: float = 120.0):
+        self.factory = factory
+        self.workers = workers or int(os.getenv("GRAPH_WORKERS", "0")) or os.cpu_count() or 1
+        self.threads_per_worker = threads_per_worker or int(os.getenv("GRAPH_WORKER_THREADS", "32"))
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self.start_timeout = start_timeout
+        self._ctx = mp.get_context("spawn")  # never fork a process that already runs threads
+        self._responses = self._ctx.Queue()
+        self._slots = [_Slot(i) for i in range(self.workers)]
+        self._ids = itertools.count()
+        self._lock = threading.RLock()
+        self._closed = False
+        self.crashes = 0
+        self.retired = 0
+
+        for slot in self._slots:
+            self._spawn(slot)
+        threading.Thread(target=self._read_responses, name="graph-pool-reader", daemon=True).start()
+        deadline = time.monotonic() + start_timeout
+        for slot in self._slots:
+            if not slot.ready.wait(max(0.0, deadline - time.monotonic())) or slot.error:
+                self.close()
+                raise RuntimeError(f"Graph worker {slot.slot} failed to start: {slot.error or 'timed out'}")
+        threading.Thread(target=self._supervise, name="graph-pool-supervisor", daemon=True).start()
+        print(f"🧵 Graph worker pool: {self.workers} processes x {self.threads_per_worker} threads")
+
+    # ---- routing -------------------------------------------------------------
+
+    def _live(self) -> list:
+        return [s for s in self._slots if not s.retired]
+
+    def worker_for(self, thread_id: str) -> int:
+        """Slot that owns thread_id: highest rendezvous score among live slots"""
+        live = self._live()
+        if not live:
+            raise NoWorkersAvailable("All graph workers have been retired")
+        if thread_id is None:
+            return min(live, key=lambda s: len(s.inflight)).slot
+
+        def score(slot):
+            digest = hashlib.blake2b(f"{slot.slot}:{thread_id}".encode("utf-8"), digest_size=8).digest()
+            return int.from_bytes(digest, "big")
+
+        return max(live, key=score).slot
+
+    # ---- calls ---------------------------------------------------------------
+
+    def submit(self, method: str, *args, **kwargs) -> Future:
+        thread_id = (kwargs.get("config") or {}).get("configurable", {}).get("thread_id")
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Graph worker pool is closed")
+            slot = self._slots[self.worker_for(thread_id)]
+            request_id = next(self._ids)
+            slot.inflight[request_id] = future
+            slot.requests.put((request_id, method, args, kwargs))
+        return future
+
+    def invoke(self, input, config=None, timeout: float = None, **kwargs):
+        return self.submit("invoke", input, config=config, **kwargs).result(timeout)
+
+    def get_state(self, config, timeout: float = None, **kwargs):
+        return self.submit("get_state", config=config, **kwargs).result(timeout)
+
+    def _read_responses(self):
+        while True:
+            try:
+                request_id, index, ok, payload = self._responses.get()
+            except (EOFError, OSError):
+                return
+            slot = self._slots[index]
+            if request_id is None:  # startup handshake
+                slot.error = None if ok else pickle.loads(payload)
+                slot.ready.set()
+                continue
+            with self._lock:
+                future = slot.inflight.pop(request_id, None)
+                slot.completed += 1
+            if future is None:
+                continue  # already failed by the supervisor
+            value = pickle.loads(payload)
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    # ---- supervision -----------------------------------------------------------
+
+    def _spawn(self, slot: _Slot):
+        slot.ready.clear()
+        slot.error = None
+        slot.requests = self._ctx.Queue()
+        slot.process = self._ctx.Process(
+            target=_worker_main, name=f"graph-worker-{slot.slot}", daemon=True,
+            args=(slot.slot, self.factory, self.threads_per_worker, slot.requests, self._responses),
+        )
+        slot.process.start()
+
+    def _supervise(self, interval: float = 0.5):
+        while not self._closed:
+            time.sleep(interval)
+            for slot in self._slots:
+                if slot.retired or slot.process.is_alive() or self._closed:
+                    continue
+                self._handle_crash(slot)
+
+    def _handle_crash(self, slot: _Slot):
+        with self._lock:
+            self.crashes += 1
+            lost, slot.inflight = slot.inflight, {}
+            now = time.monotonic()
+            slot.restarts = [t for t in slot.restarts if now - t < self.restart_window] + [now]
+            exitcode = slot.process.exitcode
+            if len(slot.restarts) > self.max_restarts:
+                slot.retired = True
+                self.retired += 1
+                print(f"⚠️ Graph worker {slot.slot} keeps crashing (exit {exitcode}) — retired; "
+                      f"its sessions move to {len(self._live())} remaining workers")
+            else:
+                print(f"⚠️ Graph worker {slot.slot} died (exit {exitcode}) — restarting")
+                self._spawn(slot)
+        for future in lost.values():
+            future.set_exception(WorkerCrashed(f"Graph worker {slot.slot} died during the call"))
+        if not slot.retired and not slot.ready.wait(self.start_timeout):
+            print(f"⚠️ Graph worker {slot.slot} did not come back up")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": len(self._live()),
+                "crashes": self.crashes,
+                "retired": self.retired,
+                "per_worker": [{
+                    "slot": s.slot,
+                    "pid": s.process.pid if s.process else None,
+                    "alive": bool(s.process and s.process.is_alive()),
+                    "retired": s.retired,
+                    "inflight": len(s.inflight),
+                    "completed": s.completed,
+                } for s in self._slots],
+            }
+
+    def close(self, timeout: float = 10.0):
+        with self._lock:
+            self._closed = True
+        for slot in self._slots:
+            if slot.process and slot.process.is_alive():
+                try:
+                    slot.requests.put(None)
+                except (OSError, ValueError):
+                    pass
+        for slot in self._slots:
+            if slot.process:
+                slot.process.join(timeout)
+                if slot.process.is_alive():
+                    slot.process.terminate()